@@ -1,51 +1,290 @@
 import math
-from typing import Optional
+import threading
+import time
+from array import array
+from typing import TYPE_CHECKING, Callable, Iterator, Optional
 
-from hex import HexMap, HexCoord
+import evaluation
+from book import OpeningBook
+from hex import HexMap, HexCoord, piece_names, CELL_BITS, CELL_MASK, MOVE_MASK, CAPTURE
+from tablebase import TablebaseSet, DRAW, WIN
+from transposition import TranspositionTable, EXACT, LOWER, UPPER
+
+if TYPE_CHECKING:
+    from parallel import ParallelSearch
+
+
+class SearchTimeout(Exception):
+    """Raised inside a search when its time or node budget runs out, or it is told to stop."""
+
+
+class SearchStats:
+    """
+    Statistics about a search, filled in when passed to `AI.move`. Collecting them is opt-in, as it costs a little time.
+    Only the calling process is counted, so a parallel search reports its root nodes alone.
+    """
+
+    def __init__(self):
+        self.nodes: int = 0
+        self.quiescence_nodes: int = 0
+        self.seconds: float = 0
+        self.beta_cutoffs: int = 0
+        self.first_move_cutoffs: int = 0
+        self.cache_hits: int = 0
+        self.cache_probes: int = 0
+
+        # For each finished iteration: its depth, score for the side to move, total nodes and seconds so far, and
+        # principal variation.
+        self.iterations: list[dict] = []
+
+        # Called with each iteration as it finishes, from the thread doing the search, to report progress.
+        self.on_iteration: Optional[Callable[[dict], None]] = None
+
+    @property
+    def depth(self) -> int:
+        """The deepest iteration that finished."""
+        return self.iterations[-1]["depth"] if self.iterations else 0
+
+    @property
+    def principal_variation(self) -> list[str]:
+        """The line of best play found by the deepest iteration that finished, in Glinski's notation."""
+        return self.iterations[-1]["pv"] if self.iterations else []
+
+    @property
+    def nodes_per_second(self) -> float:
+        return self.nodes / self.seconds if self.seconds else 0.0
+
+    @property
+    def first_move_cutoff_rate(self) -> float:
+        """How often a beta cutoff came from the first move tried, which shows how well moves are ordered."""
+        return self.first_move_cutoffs / self.beta_cutoffs if self.beta_cutoffs else 0.0
+
+    @property
+    def cache_hit_rate(self) -> float:
+        return self.cache_hits / self.cache_probes if self.cache_probes else 0.0
+
+    @property
+    def branching_factor(self) -> float:
+        """The effective branching factor: how many times more nodes the last iteration took than the one before."""
+        if len(self.iterations) < 2:
+            return 0.0
+        # Iterations record the running total of nodes, so take the differences.
+        totals: list[int] = [0] + [iteration["nodes"] for iteration in self.iterations[-3:]]
+        last_nodes: int = totals[-1] - totals[-2]
+        previous_nodes: int = totals[-2] - totals[-3]
+        return last_nodes / previous_nodes if previous_nodes else 0.0
+
+    def as_dict(self) -> dict:
+        """The statistics as plain values, ready to be written out as JSON."""
+        return {
+            "depth": self.depth,
+            "nodes": self.nodes,
+            "quiescence_nodes": self.quiescence_nodes,
+            "seconds": self.seconds,
+            "nodes_per_second": self.nodes_per_second,
+            "beta_cutoffs": self.beta_cutoffs,
+            "first_move_cutoff_rate": self.first_move_cutoff_rate,
+            "cache_hit_rate": self.cache_hit_rate,
+            "branching_factor": self.branching_factor,
+            "principal_variation": self.principal_variation,
+            "iterations": self.iterations,
+        }
 
 
 class AI:
     capture_values = {
         None: 0,
 
-        "w_pawn": 10,
-        "w_rook": 40,
-        "w_king": 150,
-        "w_bishop": 40,
-        "w_knight": 40,
-        "w_queen": 250,
-
-        "b_pawn": -10,
-        "b_rook": -40,
-        "b_king": -150,
-        "b_bishop": -40,
-        "b_knight": -40,
-        "b_queen": -250,
+        **{f"w_{piece_type}": value for piece_type, value in evaluation.material.items()},
+        **{f"b_{piece_type}": -value for piece_type, value in evaluation.material.items()},
     }
-    cache = dict()
+
+    # The worth of each piece code, regardless of colour, for ordering captures.
+    piece_values: list[int] = [abs(value) for value in map(capture_values.get, piece_names)]
+
+    # How much more than the captured piece's worth a capture might gain, for delta pruning in the quiescence search.
+    # None turns delta pruning off.
+    delta_margin: Optional[int] = 20
+
+    # The score of a side that has no moves left, which is always worse than anything `evaluate` can return.
+    mate_score: int = 100000
+
+    # Scores further from zero than this are checkmates, counting down from `mate_score` by the ply of the mate.
+    mate_threshold: int = mate_score - 1000
+
+    cache: TranspositionTable = TranspositionTable(megabytes=16)
+
+    # Moves to play without searching, in the positions they cover. None until a book is loaded.
+    book: Optional[OpeningBook] = None
+
+    # Endgames worked out in full, looked up instead of searched, at the root and at every node. None until loaded.
+    tablebases: Optional[TablebaseSet] = None
+
+    # The budget of the search in progress, set by `move`. `minimax` raises `SearchTimeout` once either runs out, or
+    # once the stop event is set.
+    deadline: Optional[float] = None
+    node_limit: Optional[int] = None
+    stop: Optional[threading.Event] = None
+    nodes: int = 0
+
+    # Quiet moves that caused a beta cutoff, two per ply, and how much each quiet move has caused cutoffs overall.
+    # Moves are packed, and index the history table directly, as quiet moves have no flags.
+    killers: dict[int, list[int]] = dict()
+    history: array = array("I", [0]) * (1 << 14)
+
+    # The arrays moves are generated into, three per ply, reused from one node to the next so the search doesn't
+    # allocate a list of moves at every node.
+    move_buffers: list[array] = []
+
+    # The statistics of the search in progress, if they were asked for.
+    stats: Optional[SearchStats] = None
+
+    @staticmethod
+    def move(hex_map: HexMap, time_limit: Optional[float] = None, max_depth: int = 4,
+             node_limit: Optional[int] = None, parallel: Optional["ParallelSearch"] = None,
+             stats: Optional[SearchStats] = None, stop: Optional[threading.Event] = None) -> tuple[HexCoord, HexCoord]:
+        """
+        Makes a move on the board for the side to move, by calling a minimax search. Positions in the opening book
+        or the tablebases aren't searched: a book move, or the tablebases' best move, is played straight away.
+        The search deepens one ply at a time, up to `max_depth` plies, until the time limit (in seconds) or node limit
+        runs out, or another thread sets the `stop` event. The best move of the deepest search that finished is played.
+        The first ply is always searched.
+        Given a `ParallelSearch`, the root moves are spread across its worker processes, and the node limit applies
+        to each root move. The worker processes don't see the stop event. Given a `SearchStats`, it is filled in as
+        the search goes.
+        """
+        if AI.book is not None:
+            book_move: Optional[tuple[int, int]] = AI.book.choose(hex_map)
+            if book_move is not None:
+                hex_map.push(book_move)
+                return hex_map.coords[book_move[0]], hex_map.coords[book_move[1]]
+
+        if AI.tablebases is not None:
+            tablebase_move: Optional[tuple[int, int]] = AI.tablebases.best_move(hex_map)
+            if tablebase_move is not None:
+                hex_map.push(tablebase_move)
+                return hex_map.coords[tablebase_move[0]], hex_map.coords[tablebase_move[1]]
+
+        root_moves: list[tuple[int, int]] = hex_map.legal_moves("b" if hex_map.ply % 2 else "w")
+        best_move: tuple[int, int] = root_moves[0]
+
+        start_time: float = time.perf_counter()
+        deadline: Optional[float] = None if time_limit is None else start_time + time_limit
+        AI.nodes = 0
+
+        AI.stats = stats
+        cache_hits, cache_misses = AI.cache.hits, AI.cache.misses
+
+        # Killer moves are only relevant to the position they were found in, but history carries over, fading.
+        AI.killers.clear()
+        for i in range(len(AI.history)):
+            AI.history[i] >>= 1
+
+        for depth in range(1, max_depth + 1):
+            AI.deadline = deadline if depth > 1 else None
+            AI.node_limit = node_limit if depth > 1 else None
+            AI.stop = stop if depth > 1 else None
+
+            undo_depth: int = len(hex_map.undo_stack)
+            try:
+                if parallel is None:
+                    best_score, best_move = AI.search_root(hex_map, depth, root_moves)
+                else:
+                    best_score, best_move = parallel.search_root(hex_map, depth, root_moves, AI.deadline, AI.node_limit)
+            except SearchTimeout:
+                # Take back the moves of the abandoned search, and fall back on the last one that finished.
+                while len(hex_map.undo_stack) > undo_depth:
+                    hex_map.pop()
+                break
+
+            # Searching the best move first gives the next iteration its best alpha bound straight away.
+            root_moves.remove(best_move)
+            root_moves.insert(0, best_move)
+
+            if stats is not None:
+                stats.iterations.append({
+                    "depth": depth,
+                    "score": best_score,
+                    "nodes": AI.nodes,
+                    "seconds": time.perf_counter() - start_time,
+                    "pv": [hex_map.move_name(move) for move in AI.principal_variation(hex_map, best_move, depth)],
+                })
+                if stats.on_iteration is not None:
+                    stats.on_iteration(stats.iterations[-1])
+
+        AI.deadline = AI.node_limit = AI.stop = None
+
+        if stats is not None:
+            stats.nodes = AI.nodes
+            stats.seconds = time.perf_counter() - start_time
+            stats.cache_hits = AI.cache.hits - cache_hits
+            stats.cache_probes = stats.cache_hits + AI.cache.misses - cache_misses
+        AI.stats = None
+
+        # A cache kept in a file is written out after every move, so a crash loses no more than one move's work.
+        AI.cache.flush()
+
+        hex_map.push(best_move)
+        return hex_map.coords[best_move[0]], hex_map.coords[best_move[1]]
 
     @staticmethod
-    def move(hex_map: HexMap) -> tuple[HexCoord, HexCoord]:
+    def search_root(hex_map: HexMap, depth: int, moves: list[tuple[int, int]]) -> tuple[float, tuple[int, int]]:
         """
-        Makes a move on the board, as Black, by calling a minimax search.
+        Searches each of the side to move's moves to a total depth in plies, returning the best score and move.
+        The score is from the point of view of the side to move.
         """
         best_score: float = -math.inf
-        best_move: Optional[tuple] = None
+        best_move: Optional[tuple[int, int]] = None
+        black_to_move: bool = hex_map.ply % 2 == 1
 
-        for (start, end) in hex_map.moves_for_col("b"):
+        for (start, end) in moves:
 
-            prev_state = hex_map[end]
-            hex_map.make_move(start, end)
-            result: float = AI.minimax(hex_map, 4, -math.inf, math.inf, False)
-            hex_map.make_move(end, start)
-            hex_map[end] = prev_state
+            # Black maximises the score and White minimises it, so White's window and results are flipped.
+            hex_map.push((start, end))
+            if black_to_move:
+                result: float = AI.minimax(hex_map, depth - 1, best_score, math.inf, False)
+            else:
+                result = -AI.minimax(hex_map, depth - 1, -math.inf, -best_score, True)
+            hex_map.pop()
 
             if result > best_score:
                 best_score = result
                 best_move = (start, end)
 
-        hex_map.make_move(*best_move)
-        return best_move
+        return best_score, best_move
+
+    @staticmethod
+    def principal_variation(hex_map: HexMap, best_move: tuple[int, int], depth: int) -> list[tuple[int, int]]:
+        """Follow the best moves stored in the transposition table from the root, to find the expected line of play."""
+        line: list[tuple[int, int]] = [best_move]
+        hex_map.push(best_move)
+
+        while len(line) < depth:
+            move: Optional[tuple[int, int]] = AI.predicted_move(hex_map)
+            if move is None:
+                break
+            line.append(move)
+            hex_map.push(move)
+
+        for _ in line:
+            hex_map.pop()
+
+        return line
+
+    @staticmethod
+    def predicted_move(hex_map: HexMap) -> Optional[tuple[int, int]]:
+        """The best move for the side to move, as stored in the transposition table, if there is one and it is legal."""
+        # Looking up moves isn't part of the search, so it shouldn't count towards the table's counters.
+        counters: tuple[int, int, int] = (AI.cache.hits, AI.cache.misses, AI.cache.collisions)
+        entry: Optional[tuple[int, int, int, int]] = AI.cache.probe(hex_map.key)
+        AI.cache.hits, AI.cache.misses, AI.cache.collisions = counters
+
+        if entry is None or not entry[3]:
+            return None
+        move: tuple[int, int] = (entry[3] & CELL_MASK, entry[3] >> CELL_BITS)
+        if move not in hex_map.legal_moves("b" if hex_map.ply % 2 else "w", move[0]):
+            return None
+        return move
 
     @staticmethod
     def minimax(hex_map: HexMap, depth: int, alpha: float, beta: float, maximising: bool) -> float:
@@ -53,61 +292,249 @@ class AI:
         Performs a minimax search down to a variable depth.
         Will handle optimisations and heuristics.
         """
-        state_hash = hash(hex_map.__str__())
-        if state_hash in AI.cache:
-            return AI.cache[state_hash]
-
-        # Add a limit on how far down to search.
+        # Add a limit on how far down to search. Beyond it, only captures are searched until the position is quiet.
         if depth == 0:
-            return AI.evaluate(hex_map)
+            return AI.quiesce(hex_map, alpha, beta, maximising)
+
+        AI.count_node()
+
+        if AI.tablebases is not None:
+            tablebase_score: Optional[float] = AI.tablebase_score(hex_map)
+            if tablebase_score is not None:
+                return tablebase_score
+
+        state_hash: int = hex_map.key
+        alpha_orig, beta_orig = alpha, beta
+
+        # A search of this position at least as deep as this one may already have settled it, or narrowed the window.
+        entry: Optional[tuple[int, int, int, int]] = AI.cache.probe(state_hash)
+        if entry is not None:
+            entry_depth, entry_score, entry_flag, _ = entry
+            entry_score = AI.score_from_cache(entry_score, hex_map.ply)
+            if entry_depth >= depth:
+                if entry_flag == EXACT:
+                    return entry_score
+                elif entry_flag == LOWER:
+                    alpha = max(alpha, entry_score)
+                elif entry_flag == UPPER:
+                    beta = min(beta, entry_score)
+                if alpha >= beta:
+                    return entry_score
 
         # This will make the initial score:
         # -Infinity for the maximiser
         # Infinity for the minimiser
         final_score: float = math.inf * (-1) ** maximising
+        best_move: int = 0
 
-        def capture_score(move: tuple[HexCoord, HexCoord]) -> int:
-            return AI.capture_values[hex_map[move[0]]] + AI.capture_values[hex_map[move[1]]]
+        tt_move: int = entry[3] if entry is not None else 0
+        moves: Iterator[int] = AI.ordered_moves(hex_map, "b" if maximising else "w", tt_move)
 
-        moves = hex_map.moves_for_col("b" if maximising else "w")
-        # moves = sorted(moves, key=capture_score, reverse=maximising)
+        for move_number, move in enumerate(moves):
 
-        for (start, end) in moves:
-
-            prev_state = hex_map[end]
-            hex_map.make_move(start, end)
+            hex_map.push_move(move)
             result: float = AI.minimax(hex_map, depth - 1, alpha, beta, not maximising)
-            hex_map.make_move(end, start)
-            hex_map[end] = prev_state
+            hex_map.pop()
 
             if maximising:
-                final_score = max(result, final_score)
+                if result > final_score:
+                    final_score, best_move = result, move & MOVE_MASK
                 alpha = max(alpha, result)
             else:
-                final_score = min(result, final_score)
+                if result < final_score:
+                    final_score, best_move = result, move & MOVE_MASK
                 beta = min(beta, result)
 
-            if alpha <= beta:
+            if alpha >= beta:
+                if AI.stats is not None:
+                    AI.stats.beta_cutoffs += 1
+                    AI.stats.first_move_cutoffs += move_number == 0
+
+                # Remember quiet moves that refute a position, to try them early in similar positions.
+                if not move & CAPTURE:
+                    AI.history[move] += depth * depth
+                    killers: list[int] = AI.killers.setdefault(hex_map.ply, [])
+                    if move not in killers:
+                        killers.insert(0, move)
+                        del killers[2:]
                 break
 
-        AI.cache[state_hash] = final_score
+        # With no moves left, the side to move is checkmated, or stalemated if its king is safe. Quicker mates score
+        # further from zero, so the search heads for them.
+        if best_move == 0:
+            if not hex_map.is_king_checked("b" if maximising else "w"):
+                return 0
+            mate: int = AI.mate_score - hex_map.ply
+            return -mate if maximising else mate
+
+        # Record whether the score is exact, or only a bound because the search fell outside the window.
+        if final_score <= alpha_orig:
+            flag: int = UPPER
+        elif final_score >= beta_orig:
+            flag = LOWER
+        else:
+            flag = EXACT
+
+        AI.cache.store(state_hash, depth, AI.score_to_cache(final_score, hex_map.ply), flag, best_move)
         return final_score
 
     @staticmethod
-    def evaluate(hex_map: HexMap) -> float:
-        map_to_vals = lambda cell: AI.capture_values[cell.state]
-        sum_vals = lambda col: sum(map(map_to_vals, hex_map.cells_with_state_col(col)))
-        modifier: int = 0
+    def score_to_cache(score: float, ply: int) -> int:
+        """
+        A score as the transposition table stores it. Mate scores count from the root of the game, so they are stored
+        counting from the position itself, which may be reached again at another ply.
+        """
+        if score > AI.mate_threshold:
+            return int(score) + ply
+        if score < -AI.mate_threshold:
+            return int(score) - ply
+        return int(score)
 
-        if hex_map.is_king_checked("w"):
-            if hex_map.is_king_checkmated("w"):
-                modifier = 1000
-            else:
-                modifier = 500
-        elif hex_map.is_king_checked("b"):
-            if hex_map.is_king_checkmated("b"):
-                modifier = -1000
+    @staticmethod
+    def score_from_cache(score: int, ply: int) -> int:
+        """A score read from the transposition table in a position at a ply, undoing `score_to_cache`."""
+        if score > AI.mate_threshold:
+            return score - ply
+        if score < -AI.mate_threshold:
+            return score + ply
+        return score
+
+    @staticmethod
+    def quiesce(hex_map: HexMap, alpha: float, beta: float, maximising: bool) -> float:
+        """
+        Searches only captures, until the position is quiet, so that the search horizon doesn't fall in the middle of
+        a trade. The side to move may always 'stand pat' on the current evaluation instead of capturing.
+        """
+        AI.count_node()
+        if AI.stats is not None:
+            AI.stats.quiescence_nodes += 1
+
+        if AI.tablebases is not None:
+            tablebase_score: Optional[float] = AI.tablebase_score(hex_map)
+            if tablebase_score is not None:
+                return tablebase_score
+
+        stand_pat: float = AI.evaluate(hex_map)
+
+        # If standing pat is already good enough for a cutoff, there's no need to look at captures.
+        if maximising:
+            if stand_pat >= beta:
+                return stand_pat
+            alpha = max(alpha, stand_pat)
+        else:
+            if stand_pat <= alpha:
+                return stand_pat
+            beta = min(beta, stand_pat)
+
+        final_score: float = stand_pat
+
+        for move in AI.ordered_captures(hex_map, "b" if maximising else "w"):
+
+            # Delta pruning: skip captures that can't bring the score back into the window, even with a margin.
+            if AI.delta_margin is not None:
+                gain: int = AI.piece_values[hex_map.board[move >> CELL_BITS & CELL_MASK]] + AI.delta_margin
+                if stand_pat + gain <= alpha if maximising else stand_pat - gain >= beta:
+                    continue
+
+            hex_map.push_move(move)
+            result: float = AI.quiesce(hex_map, alpha, beta, not maximising)
+            hex_map.pop()
+
+            if maximising:
+                final_score = max(final_score, result)
+                alpha = max(alpha, result)
             else:
-                modifier = -500
+                final_score = min(final_score, result)
+                beta = min(beta, result)
+
+            if alpha >= beta:
+                break
+
+        return final_score
+
+    @staticmethod
+    def tablebase_score(hex_map: HexMap) -> Optional[float]:
+        """
+        The score of a position from the tablebases, positive when it favours Black, or None if they don't cover it.
+        Wins are scored like the checkmate they lead to, so the search prefers the quickest.
+        """
+        result: Optional[tuple[int, int]] = AI.tablebases.probe(hex_map)
+        if result is None:
+            return None
+
+        outcome, distance = result
+        if outcome == DRAW:
+            return 0
+        mate: int = AI.mate_score - (hex_map.ply + distance)
+        return mate if (outcome == WIN) == (hex_map.ply % 2 == 1) else -mate
+
+    @staticmethod
+    def count_node():
+        """Count a node of the search, giving up on the search if it has gone over budget."""
+        AI.nodes += 1
+        if AI.node_limit is not None and AI.nodes > AI.node_limit:
+            raise SearchTimeout
+
+        # The clock and the stop event are only read every so often.
+        if AI.nodes % 256 == 0:
+            if AI.deadline is not None and time.perf_counter() > AI.deadline:
+                raise SearchTimeout
+            if AI.stop is not None and AI.stop.is_set():
+                raise SearchTimeout
+
+    @staticmethod
+    def move_buffer(hex_map: HexMap, stage: int) -> array:
+        """The array to generate one stage of a node's moves into, by the node's ply."""
+        index: int = hex_map.ply * 3 + stage
+        while len(AI.move_buffers) <= index:
+            AI.move_buffers.append(array("I"))
+        return AI.move_buffers[index]
+
+    @staticmethod
+    def ordered_captures(hex_map: HexMap, color: str) -> list[int]:
+        """The legal captures for a colour, packed, ordered by most valuable victim, then least valuable attacker."""
+        board: bytearray = hex_map.board
+        captures: array = hex_map.legal_move_codes(color, AI.move_buffer(hex_map, 0), quiets=False)
+        return sorted(captures, key=lambda move: AI.piece_values[board[move >> CELL_BITS & CELL_MASK]] * 1000
+                      - AI.piece_values[board[move & CELL_MASK]], reverse=True)
+
+    @staticmethod
+    def ordered_moves(hex_map: HexMap, color: str, tt_move: int = 0) -> Iterator[int]:
+        """
+        Yields the legal moves for a colour, packed, most promising first, so that alpha-beta cuts off as early as
+        possible. The order is: the transposition table move, captures by most valuable victim / least valuable
+        attacker, killer moves, then quiet moves by history. Each stage is only generated and sorted once the one
+        before it runs out.
+        """
+        # The best move from an earlier search of this position, as long as it is legal here.
+        first_move: int = 0
+        if tt_move:
+            for move in hex_map.legal_move_codes(color, AI.move_buffer(hex_map, 1), tt_move & CELL_MASK):
+                if move & MOVE_MASK == tt_move:
+                    first_move = move
+                    break
+        if first_move:
+            yield first_move
 
-        return -(sum_vals("b") + sum_vals("w")) + modifier
+        for move in AI.ordered_captures(hex_map, color):
+            if move != first_move:
+                yield move
+
+        quiets: array = hex_map.legal_move_codes(color, AI.move_buffer(hex_map, 2), captures=False)
+        killers: list[int] = [move for move in AI.killers.get(hex_map.ply, []) if move in quiets]
+        for move in killers:
+            if move != first_move:
+                yield move
+
+        for move in sorted(quiets, key=AI.history.__getitem__, reverse=True):
+            if move != first_move and move not in killers:
+                yield move
+
+    @staticmethod
+    def evaluate(hex_map: HexMap) -> float:
+        """
+        The static evaluation of a position, positive when it favours Black.
+        The board keeps its material and piece-square score up to date as moves are made, so this is a single read.
+        Checkmate and stalemate are left to the search, which finds them when a side has no moves.
+        """
+        return -hex_map.score
@@ -0,0 +1,138 @@
+# Board arrays and vectorised evaluation with NumPy, for working through thousands of positions at once, such as when
+# generating self-play data. NumPy is only needed by this module: the game and the engine run without it.
+import math
+from functools import lru_cache
+from typing import Iterable, Union
+
+import numpy as np
+
+from hex import HexMap, piece_codes, piece_names, EMPTY, PAWN, BLACK, TYPE_MASK
+
+# The piece codes of the one-hot planes, in order: White's pawn to king, then Black's.
+plane_codes: np.ndarray = np.array([
+    piece_codes[f"{color}_{name}"] for color in "wb" for name in ("pawn", "knight", "bishop", "rook", "queen", "king")
+], dtype=np.uint8)
+
+# The contents of the extra cell at the end of each board while walking rays. Every ray ends on it, like a wall.
+WALL: int = 255
+
+# Which moves a ray allows. Pawns move forwards without capturing, and capture without moving forwards.
+ANY_MOVE, QUIET_ONLY, CAPTURE_ONLY = range(3)
+
+# How many boards to walk rays for at a time, to keep the intermediate arrays small.
+CHUNK_SIZE: int = 4096
+
+
+def to_array(positions: Union[HexMap, Iterable[HexMap]]) -> np.ndarray:
+    """The piece codes of a position, or of a list of positions, as an array of shape (N, cells)."""
+    if isinstance(positions, HexMap):
+        positions = [positions]
+    boards: list[bytes] = [bytes(position.board) for position in positions]
+    return np.frombuffer(bytearray(b"".join(boards)), dtype=np.uint8).reshape(len(boards), -1)
+
+
+def one_hot(boards: np.ndarray) -> np.ndarray:
+    """Split an (N, cells) array of boards into an (N, 12, cells) array, with one plane of 0s and 1s per piece."""
+    return (boards[:, None, :] == plane_codes[None, :, None]).astype(np.uint8)
+
+
+def radius_of(cells: int) -> int:
+    """The radius of a board with some number of cells."""
+    return round((math.sqrt(12 * cells - 3) - 3) / 6)
+
+
+def evaluate(boards: np.ndarray) -> np.ndarray:
+    """The material and piece-square evaluation of every board, positive when it favours Black, like `AI.evaluate`."""
+    square_values: np.ndarray = np.array(HexMap.from_radius(radius_of(boards.shape[1])).square_values, dtype=np.int32)
+    return -square_values[boards, np.arange(boards.shape[1])].sum(axis=1)
+
+
+@lru_cache(maxsize=None)
+def ray_arrays(cells: int) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Every ray of every piece code from every cell of a board size, flattened from `HexMap.ray_table` for gathering.
+    Returns the index of the first ray and the number of rays for each (piece code, cell), each ray's kind, and an
+    array of the cells along each ray, padded with the wall.
+    """
+    hex_map: HexMap = HexMap.from_radius(radius_of(cells))
+    first_ray: np.ndarray = np.zeros((16, cells), dtype=np.int64)
+    ray_count: np.ndarray = np.zeros((16, cells), dtype=np.int64)
+    kinds, rays = [], []
+
+    for code, name in enumerate(piece_names):
+        if name is None:
+            continue
+        for start, cell_rays in enumerate(hex_map.ray_table[code]):
+            first_ray[code, start] = len(rays)
+            for i, ray in enumerate(cell_rays):
+                if not ray:
+                    continue
+                if code & TYPE_MASK == PAWN:
+                    kinds.append(QUIET_ONLY if i == 0 else CAPTURE_ONLY)
+                else:
+                    kinds.append(ANY_MOVE)
+                rays.append(ray)
+            ray_count[code, start] = len(rays) - first_ray[code, start]
+
+    # The wall sits just past the last cell, and every ray is padded out with it, so each ray has a blocker.
+    ray_cells: np.ndarray = np.full((len(rays), max(map(len, rays)) + 1), cells, dtype=np.int64)
+    for i, ray in enumerate(rays):
+        ray_cells[i, :len(ray)] = ray
+
+    return first_ray, ray_count, np.array(kinds, dtype=np.uint8), ray_cells
+
+
+def mobility(boards: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Count the pseudo-legal moves and the attacks of each side on every board, returning two (N, 2) arrays with White's
+    count first. Pseudo-legal moves include those that leave the king in check. Attacks count every cell that a piece
+    could capture on, including its own pieces that it defends, once for each piece attacking it.
+    """
+    moves: np.ndarray = np.zeros((len(boards), 2), dtype=np.int64)
+    attacks: np.ndarray = np.zeros((len(boards), 2), dtype=np.int64)
+    first_ray, ray_count, kinds, ray_cells = ray_arrays(boards.shape[1])
+
+    for first in range(0, len(boards), CHUNK_SIZE):
+        chunk: np.ndarray = boards[first:first + CHUNK_SIZE]
+        padded: np.ndarray = np.concatenate([chunk, np.full((len(chunk), 1), WALL, dtype=np.uint8)], axis=1)
+
+        # Only walk the rays of the pieces that are actually on each board: every ray of every occupied cell.
+        piece_board, piece_cell = np.nonzero(chunk)
+        cell_codes: np.ndarray = chunk[piece_board, piece_cell]
+        counts: np.ndarray = ray_count[cell_codes, piece_cell]
+        board_index: np.ndarray = np.repeat(piece_board, counts)
+        ray_codes: np.ndarray = np.repeat(cell_codes, counts)
+        ray_index: np.ndarray = (np.repeat(first_ray[cell_codes, piece_cell] - np.cumsum(counts) + counts, counts)
+                                 + np.arange(counts.sum()))
+
+        # Each ray runs over empty cells until it hits a piece, or the wall. Step along all the rays at once, dropping
+        # each ray as soon as it is blocked, so that short rays cost no more than their length.
+        cells: np.ndarray = padded.ravel()
+        board_offset: np.ndarray = board_index * padded.shape[1]
+        empty_run: np.ndarray = np.zeros(len(ray_index), dtype=np.int64)
+        blocker: np.ndarray = np.full(len(ray_index), WALL, dtype=np.uint8)
+        active: np.ndarray = np.arange(len(ray_index))
+
+        for step in range(ray_cells.shape[1]):
+            contents: np.ndarray = cells[board_offset[active] + ray_cells[ray_index[active], step]]
+            is_empty: np.ndarray = contents == EMPTY
+            blocker[active[~is_empty]] = contents[~is_empty]
+            active = active[is_empty]
+            empty_run[active] += 1
+            if not len(active):
+                break
+
+        is_piece: np.ndarray = blocker != WALL
+        is_enemy: np.ndarray = is_piece & ((blocker & BLACK) != (ray_codes & BLACK))
+
+        ray_kinds: np.ndarray = kinds[ray_index]
+        ray_moves: np.ndarray = np.where(ray_kinds == QUIET_ONLY, empty_run,
+                                         np.where(ray_kinds == CAPTURE_ONLY, is_enemy, empty_run + is_enemy))
+        ray_attacks: np.ndarray = np.where(ray_kinds == QUIET_ONLY, 0, empty_run + is_piece)
+
+        # Sum the rays up by board and side.
+        bins: np.ndarray = board_index * 2 + (ray_codes >> 3)
+        moves[first:first + len(chunk)] = np.bincount(bins, ray_moves, len(chunk) * 2).reshape(-1, 2)
+        attacks[first:first + len(chunk)] = np.bincount(bins, ray_attacks, len(chunk) * 2).reshape(-1, 2)
+
+    return moves, attacks
@@ -0,0 +1,142 @@
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+
+import parallel
+from ai import AI, SearchStats
+from hex import HexMap
+
+# Positions with Black to move for the search benchmark, as (board string, ply).
+search_positions: dict[str, tuple[str, int]] = {
+    "opening": (
+        "xxxxxxpxxxxxPrpxxxxPRnxpxxxPxNqxxpxxPxxQbbbxxpPxBBBkxxpxxPxxKnxpxxxPxNrpxxxxPRpxxxxxPxxxxxx", 1
+    ),
+    "middlegame-1": (
+        "xxxxqxpxxxxPxrpxxxxPbxxpxNxPxxbbxpxxPxQxxxxxxpPxBBBxnxpxxPxxKnkpxxPxxxrpxxxPxRpxxxxNPxxxxxx", 15
+    ),
+    "middlegame-2": (
+        "xxxxxxrpxxxxPxpxxxxPRnxpxxxPxNbxxpnxPBBxbxqxpxPxBKxkxxpxxPxxxxxpQxxPxNxrpxxxPRpxxxxbPxxxxxx", 25
+    ),
+    "middlegame-3": (
+        "xxxxxxppxxxQPrxxxxxPRnxxpxxxxNxnxpxxPxbKbqbxpxPNBxxkxrpxxPxxxxxpxxPxRxxxpxxPxxxpxxxPxxxxxxx", 35
+    ),
+    "endgame-rook": (
+        "xxxxxxxxxxxxxrxxxxxxxxxxxxxNxxxxxpxxxxxxxxxxpxPxxxxkxxxxxxxxKxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx", 1
+    ),
+    "endgame-queen": (
+        "xxxxxxxxxxxxxxxxxxxxRxxxxxxxxxxxxxqxPxxxxxbxxxPxxKxkxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx", 1
+    ),
+}
+
+
+def bench_parallel(args: argparse.Namespace):
+    """Report how a fixed-depth root search speeds up with more worker processes."""
+    print(f"Parallel root search, depth {args.depth}")
+    print(f"{'workers':>8} {'seconds':>9} {'speedup':>8}")
+    for workers, seconds, speedup in parallel.benchmark(args.depth, tuple(args.workers)):
+        print(f"{workers:>8} {seconds:>9.2f} {speedup:>8.2f}")
+
+
+def bench_search(args: argparse.Namespace):
+    """Run `AI.move` over the fixed benchmark positions, and write a JSON report of the search statistics."""
+    results: list[dict] = []
+    for name, (board_str, ply) in search_positions.items():
+        # Every position starts from an empty table, so that runs don't depend on each other.
+        AI.cache.clear()
+        stats: SearchStats = SearchStats()
+
+        hex_map: HexMap = HexMap.from_str(board_str, ply)
+        start, end = AI.move(hex_map, time_limit=args.time, max_depth=args.depth, stats=stats)
+
+        results.append({"position": name, "move": hex_map.move_name((start, end)), **stats.as_dict()})
+        print(f"{name}: {results[-1]['move']} at depth {stats.depth}, {stats.nodes} nodes, "
+              f"{stats.nodes_per_second:.0f} nodes/sec", file=sys.stderr)
+
+    nodes: int = sum(result["nodes"] for result in results)
+    seconds: float = sum(result["seconds"] for result in results)
+    report: dict = {
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "max_depth": args.depth,
+        "time_limit": args.time,
+        "nodes": nodes,
+        "seconds": seconds,
+        "nodes_per_second": nodes / seconds if seconds else 0.0,
+        "positions": results,
+    }
+
+    if args.output is None:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+
+
+def random_positions(count: int, seed: int = 0) -> list[HexMap]:
+    """Positions from random games of up to 60 plies from the start, the same every time for the same seed."""
+    rng: random.Random = random.Random(seed)
+    positions: list[HexMap] = []
+    while len(positions) < count:
+        hex_map: HexMap = HexMap.from_glinski()
+        for _ in range(rng.randrange(60)):
+            moves: list[tuple[int, int]] = hex_map.legal_moves("b" if hex_map.ply % 2 else "w")
+            if not moves:
+                break
+            hex_map.push(rng.choice(moves))
+        positions.append(HexMap.from_bytes(hex_map.to_bytes()))
+    return positions
+
+
+def bench_batch(args: argparse.Namespace):
+    """Compare evaluating and counting the moves of many positions with NumPy against looping over them."""
+    import batch  # Only this benchmark needs NumPy.
+
+    positions: list[HexMap] = random_positions(args.unique)
+    print(f"{args.count} positions, {len(positions)} of them unique")
+    positions = [positions[i % len(positions)] for i in range(args.count)]
+
+    start_time: float = time.perf_counter()
+    for hex_map in positions:
+        hex_map.compute_score()
+        len(hex_map.legal_moves("w")) + len(hex_map.legal_moves("b"))
+    loop_seconds: float = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    boards = batch.to_array(positions)
+    batch.evaluate(boards)
+    batch.mobility(boards)
+    batch_seconds: float = time.perf_counter() - start_time
+
+    print(f"{'':>8} {'seconds':>9} {'positions/sec':>14}")
+    print(f"{'loop':>8} {loop_seconds:>9.3f} {args.count / loop_seconds:>14.0f}")
+    print(f"{'batch':>8} {batch_seconds:>9.3f} {args.count / batch_seconds:>14.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks for the hex chess engine.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    parallel_parser = commands.add_parser("parallel", help="speedup of the parallel root search")
+    parallel_parser.add_argument("--depth", type=int, default=3, help="search depth in plies")
+    parallel_parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8], help="worker counts to try")
+    parallel_parser.set_defaults(run=bench_parallel)
+
+    search_parser = commands.add_parser("search", help="search statistics over fixed positions, as JSON")
+    search_parser.add_argument("--depth", type=int, default=4, help="maximum search depth in plies")
+    search_parser.add_argument("--time", type=float, default=None, help="time limit per position, in seconds")
+    search_parser.add_argument("--output", default=None, help="file to write the report to, instead of stdout")
+    search_parser.set_defaults(run=bench_search)
+
+    batch_parser = commands.add_parser("batch", help="NumPy batch evaluation against a loop, needs NumPy")
+    batch_parser.add_argument("--count", type=int, default=10000, help="number of positions")
+    batch_parser.add_argument("--unique", type=int, default=200, help="number of different random positions")
+    batch_parser.set_defaults(run=bench_batch)
+
+    parsed_args = parser.parse_args()
+    parsed_args.run(parsed_args)
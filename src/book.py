@@ -0,0 +1,150 @@
+import argparse
+import json
+import mmap
+import random
+import struct
+from collections import Counter
+from typing import Iterable, Iterator, Optional
+
+from hex import HexMap, pack_move, unpack_move
+
+# Every book file starts with this, so that other files aren't mistaken for books.
+MAGIC: bytes = b"HEXBOOK1"
+
+# One record per (position, move): the position's key, the move packed as start | end << 7, and its weight.
+# Records are sorted by key, then move, so all the moves of a position sit together.
+RECORD: struct.Struct = struct.Struct("<QHI")
+
+
+class OpeningBook:
+    """
+    A read-only opening book file, memory-mapped so that every process using it shares one copy in the page cache.
+    Positions are looked up by binary search on their key, without reading the file in.
+    """
+
+    def __init__(self, path: str):
+        self.path: str = path
+        with open(path, "rb") as file:
+            self.mmap: mmap.mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self.mmap[:len(MAGIC)] != MAGIC or (len(self.mmap) - len(MAGIC)) % RECORD.size:
+            self.mmap.close()
+            raise ValueError(f"{path} isn't an opening book")
+        self.count: int = (len(self.mmap) - len(MAGIC)) // RECORD.size
+
+    def __len__(self) -> int:
+        """The number of (position, move) records in the book."""
+        return self.count
+
+    def close(self):
+        self.mmap.close()
+
+    def key_at(self, index: int) -> int:
+        return struct.unpack_from("<Q", self.mmap, len(MAGIC) + index * RECORD.size)[0]
+
+    def probe(self, key: int) -> list[tuple[tuple[int, int], int]]:
+        """The book moves for a position key, with their weights. Empty if the position isn't in the book."""
+        # Find the first record with the key.
+        low, high = 0, self.count
+        while low < high:
+            middle: int = (low + high) // 2
+            if self.key_at(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        moves: list[tuple[tuple[int, int], int]] = []
+        for index in range(low, self.count):
+            record_key, move, weight = RECORD.unpack_from(self.mmap, len(MAGIC) + index * RECORD.size)
+            if record_key != key:
+                break
+            moves.append((unpack_move(move), weight))
+        return moves
+
+    def choose(self, hex_map: HexMap, rng: random.Random = random) -> Optional[tuple[int, int]]:
+        """
+        Pick a book move for the side to move, at random in proportion to the weights, or None if there isn't one.
+        Moves are checked against the legal moves, in case of a key collision with some other position.
+        """
+        # Out of the book, as most positions are, nothing else needs doing. Otherwise only the few moves found are
+        # checked, from their own start cells.
+        records: list[tuple[tuple[int, int], int]] = self.probe(hex_map.key)
+        if not records:
+            return None
+
+        color: str = "b" if hex_map.ply % 2 else "w"
+        moves: list[tuple[tuple[int, int], int]] = [
+            (move, weight) for move, weight in records
+            if weight > 0 and move[0] < len(hex_map.board) and move in hex_map.legal_moves(color, move[0])
+        ]
+        if not moves:
+            return None
+        return rng.choices([move for move, _ in moves], [weight for _, weight in moves])[0]
+
+
+def read_records(paths: Iterable[str]) -> Iterator[dict]:
+    """Read the game records written by `selfplay.py`, one JSON object per line."""
+    for path in paths:
+        with open(path) as file:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def build_book(records: Iterable[dict], path: str, max_plies: int = 20, min_games: int = 1) -> int:
+    """
+    Build an opening book from game records, and return the number of records written.
+    Every move played in the first `max_plies` plies is weighted by how it turned out for the side that played it: 2
+    for a win and 1 for a draw. Moves played in fewer than `min_games` games, or never won or drawn with, are left out.
+    """
+    weights: Counter = Counter()
+    games: Counter = Counter()
+
+    for record in records:
+        hex_map: HexMap = HexMap.from_glinski()
+        for name in (record.get("opening", []) + record["moves"])[:max_plies]:
+            move: tuple[int, int] = hex_map.parse_move(name)
+            entry: tuple[int, int] = (hex_map.key, pack_move(*move))
+
+            mover_won: str = "0-1" if hex_map.ply % 2 else "1-0"
+            weights[entry] += 2 if record["result"] == mover_won else 1 if record["result"] == "1/2-1/2" else 0
+            games[entry] += 1
+            hex_map.push(move)
+
+    entries: list[tuple[int, int]] = sorted(
+        entry for entry, count in games.items() if count >= min_games and weights[entry] > 0
+    )
+    with open(path, "wb") as file:
+        file.write(MAGIC)
+        for key, move in entries:
+            file.write(RECORD.pack(key, move, weights[key, move]))
+    return len(entries)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or look into an opening book.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = commands.add_parser("build", help="build a book from self-play game records")
+    build_parser.add_argument("records", nargs="+", help="game record files, as written by selfplay.py --output")
+    build_parser.add_argument("--output", default="book.bin", help="book file to write")
+    build_parser.add_argument("--plies", type=int, default=20, help="how many plies of each game to use")
+    build_parser.add_argument("--min-games", type=int, default=1, help="games a move must be played in to be kept")
+
+    show_parser = commands.add_parser("show", help="list the book moves after some moves from the start")
+    show_parser.add_argument("book", help="book file")
+    show_parser.add_argument("moves", nargs="*", help="moves from the start, such as f5f6")
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        written: int = build_book(read_records(args.records), args.output, args.plies, args.min_games)
+        print(f"Wrote {written} book moves to {args.output}")
+    else:
+        book: OpeningBook = OpeningBook(args.book)
+        position: HexMap = HexMap.from_glinski()
+        for move_name in args.moves:
+            position.push(position.parse_move(move_name))
+        for book_move, book_weight in sorted(book.probe(position.key), key=lambda item: -item[1]):
+            print(f"{position.move_name(book_move)}: {book_weight}")
+        book.close()
@@ -0,0 +1,188 @@
+import argparse
+import os
+import sys
+import threading
+from typing import Optional, TextIO
+
+from ai import AI, SearchStats
+from book import OpeningBook
+from hex import HexMap
+from tablebase import TablebaseSet
+from transposition import TranspositionTable
+
+# The deepest a search goes when it is only limited by time, nodes or `stop`, and the depth of a `go` without limits.
+UNLIMITED_DEPTH: int = 64
+DEFAULT_DEPTH: int = 4
+
+# Scores further from zero than this are checkmates, reported in moves rather than points.
+MATE_THRESHOLD: int = AI.mate_threshold
+
+
+class Engine:
+    """
+    A long-lived engine that reads commands a line at a time and writes its replies, in the style of UCI:
+
+        uci                                     identify the engine, answered by uciok
+        isready                                 answered by readyok
+        ucinewgame                              forget what earlier searches learned
+        position startpos [moves f5f6 ...]      set up the start position, then play some moves
+        position bytes <hex> [moves ...]        set up a position encoded by `HexMap.to_bytes`, then play some moves
+        go [depth N] [movetime MS] [nodes N] [infinite]
+                                                search the position, writing an info line as each depth finishes,
+                                                then bestmove
+        stop                                    stop the search, and answer with the best move so far
+        d                                       show the board
+        quit
+
+    Searches run in a background thread, so `stop` and `isready` are answered while one runs. The position, the
+    transposition table and the rest of the search state stay warm from one command to the next.
+    """
+
+    def __init__(self, output: TextIO = sys.stdout):
+        self.output: TextIO = output
+        self.output_lock: threading.Lock = threading.Lock()
+        self.hex_map: HexMap = HexMap.from_glinski()
+        self.thread: Optional[threading.Thread] = None
+        self.stop: threading.Event = threading.Event()
+
+    def send(self, line: str):
+        """Write a line of output. Both the command loop and the search thread write, so one line at a time."""
+        with self.output_lock:
+            self.output.write(line + "\n")
+            self.output.flush()
+
+    def run(self, commands: TextIO = sys.stdin):
+        """
+        Handle commands until `quit`, which stops any search, or the end of the input, which lets the last search
+        finish, so that commands can be piped in.
+        """
+        for line in commands:
+            if not self.handle(line):
+                self.wait(stop=True)
+                return
+        self.wait()
+
+    def handle(self, line: str) -> bool:
+        """Handle one command line. Returns False once it is time to quit."""
+        words: list[str] = line.split()
+        if not words:
+            return True
+        command, args = words[0], words[1:]
+
+        if command == "quit":
+            return False
+        elif command == "uci":
+            self.send("id name Hexagonal Chess")
+            self.send("uciok")
+        elif command == "isready":
+            self.send("readyok")
+        elif command == "ucinewgame":
+            self.wait(stop=True)
+            if AI.cache.path is None:
+                AI.cache.clear()
+        elif command == "position":
+            self.wait(stop=True)
+            self.set_position(args)
+        elif command == "go":
+            self.wait(stop=True)
+            self.go(args)
+        elif command == "stop":
+            self.wait(stop=True)
+        elif command == "d":
+            self.send(str(self.hex_map))
+        else:
+            self.send(f"info string unknown command {command}")
+        return True
+
+    def set_position(self, args: list[str]):
+        """Set up a position from the words after `position`."""
+        moves: list[str] = args[args.index("moves") + 1:] if "moves" in args else []
+        setup: list[str] = args[:args.index("moves")] if "moves" in args else args
+
+        try:
+            if setup[:1] == ["startpos"]:
+                hex_map: HexMap = HexMap.from_glinski()
+            elif setup[:1] == ["bytes"] and len(setup) == 2:
+                hex_map = HexMap.from_bytes(bytes.fromhex(setup[1]))
+            else:
+                raise ValueError(f"Can't set up a position from {' '.join(setup)!r}")
+        except (ValueError, StopIteration) as error:
+            self.send(f"info string {error}")
+            return
+
+        for name in moves:
+            try:
+                move: tuple[int, int] = hex_map.parse_move(name)
+            except ValueError:
+                move = (-1, -1)
+            if move not in hex_map.legal_moves("b" if hex_map.ply % 2 else "w"):
+                self.send(f"info string illegal move {name}, stopping before it")
+                break
+            hex_map.push(move)
+        self.hex_map = hex_map
+
+    def go(self, args: list[str]):
+        """Start searching the current position with the limits after `go`."""
+        limits: dict[str, int] = {name: int(value) for name, value in zip(args, args[1:])
+                                  if name in ("depth", "movetime", "nodes") and value.isdigit()}
+        limited: bool = "movetime" in limits or "nodes" in limits or "infinite" in args
+        max_depth: int = limits.get("depth", UNLIMITED_DEPTH if limited else DEFAULT_DEPTH)
+        time_limit: Optional[float] = limits["movetime"] / 1000 if "movetime" in limits else None
+
+        if not self.hex_map.has_any_legal_move("b" if self.hex_map.ply % 2 else "w"):
+            self.send("bestmove (none)")
+            return
+
+        position: HexMap = HexMap.from_bytes(self.hex_map.to_bytes())
+        stats: SearchStats = SearchStats()
+        stats.on_iteration = self.send_info
+
+        def run():
+            start, end = AI.move(position, time_limit=time_limit, max_depth=max_depth, node_limit=limits.get("nodes"),
+                                 stats=stats, stop=self.stop)
+            self.send(f"bestmove {position.move_name((start, end))}")
+
+        self.stop.clear()
+        self.thread = threading.Thread(target=run, daemon=True)
+        self.thread.start()
+
+    def send_info(self, iteration: dict):
+        """Report a finished iteration of the search."""
+        score: float = iteration["score"]
+        if abs(score) > MATE_THRESHOLD:
+            # Mates are counted in moves of the side to move, negative when it is the one getting mated.
+            plies: int = AI.mate_score - int(abs(score)) - self.hex_map.ply
+            score_text: str = f"mate {(plies + 1) // 2 if score > 0 else -(plies // 2)}"
+        else:
+            score_text = f"cp {int(score)}"
+
+        seconds: float = iteration["seconds"]
+        nps: int = int(iteration["nodes"] / seconds) if seconds else 0
+        self.send(f"info depth {iteration['depth']} score {score_text} nodes {iteration['nodes']} "
+                  f"time {int(seconds * 1000)} nps {nps} pv {' '.join(iteration['pv'])}")
+
+    def wait(self, stop: bool = False):
+        """Wait for the search under way to finish and report its move, stopping it first if asked to."""
+        if self.thread is not None:
+            if stop:
+                self.stop.set()
+            self.thread.join()
+            self.thread = None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the engine as a process that speaks a UCI-style protocol.")
+    parser.add_argument("--book", default=None, help="opening book file to play from")
+    parser.add_argument("--tablebases", default=None, help="directory of endgame tablebases to play from")
+    parser.add_argument("--cache", default=None, help="transposition table file to keep between sessions")
+    parser.add_argument("--hash", type=float, default=16, help="transposition table size, in megabytes")
+    args = parser.parse_args()
+
+    if args.book is not None:
+        AI.book = OpeningBook(args.book)
+    if args.tablebases is not None and os.path.isdir(args.tablebases):
+        AI.tablebases = TablebaseSet.load_directory(args.tablebases)
+    AI.cache = TranspositionTable(megabytes=args.hash, path=args.cache)
+
+    Engine().run()
+    AI.cache.close()
@@ -0,0 +1,72 @@
+# Piece values and piece-square tables for Glinski's hexagonal chess.
+# Every piece on every cell is worth its material value plus a positional bonus from the weights below. `HexMap` keeps
+# the sum of these up to date as moves are made and unmade, so evaluating a position is a single read.
+# The weights can be tuned freely, but boards keep the tables they were built with: after changing them, call
+# `HexMap.square_value_cache.clear()` before making new boards.
+
+import zlib
+from array import array
+
+# The material value of each piece type.
+material: dict[str, int] = {
+    "pawn": 10,
+    "knight": 40,
+    "bishop": 40,
+    "rook": 40,
+    "queen": 250,
+    "king": 150,
+}
+
+# The bonus for each step a piece is closer to the centre of the board than the edge.
+centralisation: dict[str, int] = {
+    "pawn": 0,
+    "knight": 2,
+    "bishop": 1,
+    "rook": 0,
+    "queen": 1,
+    "king": 0,
+}
+
+# The bonus for each step a pawn has advanced from its own edge of the board.
+pawn_advance: int = 1
+
+# The penalty for each step the king has left its own edge of the board.
+king_exposure: int = 2
+
+
+def square_value(name: str, p: int, q: int, r: int, radius: int) -> int:
+    """
+    The worth of a piece (named like 'w_knight') on the cell (p, q, r) of a board of some radius, to its own side.
+    Ranks are counted from the side's own edge of the file, so the tables are mirrored for Black.
+    """
+    color, piece_type = name[0], name[2:]
+
+    # Rings around the centre: 0 on the centre cell, `radius` on the edge.
+    ring: int = max(abs(p), abs(q), abs(r))
+
+    # White moves towards higher q, and Black towards lower q, so count the ranks up from each side's edge.
+    if color == "w":
+        rank: int = q - max(-radius, -radius - p)
+    else:
+        rank = min(radius, radius - p) - q
+
+    value: int = material[piece_type] + centralisation[piece_type] * (radius - ring)
+
+    if piece_type == "pawn":
+        value += pawn_advance * rank
+    elif piece_type == "king":
+        value -= king_exposure * rank
+
+    return value
+
+
+def fingerprint(radius: int = 5) -> int:
+    """
+    A 32-bit checksum of every piece's worth on every cell of a board, which changes whenever the evaluation is tuned.
+    Scores stored with one evaluation can be told apart from another's by it.
+    """
+    values: list[int] = [square_value(f"{color}_{piece_type}", p, q, -p - q, radius)
+                         for color in "wb" for piece_type in material
+                         for p in range(-radius, radius + 1)
+                         for q in range(max(-radius, -radius - p), min(radius, radius - p) + 1)]
+    return zlib.crc32(array("i", values).tobytes())
@@ -1,11 +1,14 @@
 from __future__ import annotations  # Necessary to use the class as a type annotation in its own members.
 
-import copy
+from array import array
+from functools import lru_cache
 from typing import Optional  # For T | None annotations.
 from typing import Union
 
 import math
+import random
 
+import evaluation
 from pixel import PixelCoord
 
 move_vectors = {
@@ -62,6 +65,89 @@ move_vectors = {
     ]
 }
 
+# Compact piece codes, as stored in `HexMap.board`. The low three bits are the piece type and `BLACK` marks the colour.
+EMPTY = 0
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(1, 7)
+WHITE, BLACK = 0, 8
+TYPE_MASK = 7
+
+color_bits: dict[str, int] = {"w": WHITE, "b": BLACK}
+
+# Moves packed into one int for the search, cheap to store and compare: the start cell in the low 7 bits, the end
+# cell in the next 7, then flags. Boards up to radius 6 fit. The transposition table and opening book store moves
+# without flags. The promotion bits are set aside for the promoted piece type, though pawns don't promote yet.
+CELL_BITS = 7
+CELL_MASK = (1 << CELL_BITS) - 1
+MOVE_MASK = (1 << 2 * CELL_BITS) - 1
+CAPTURE = 1 << 14
+PROMOTION_SHIFT = 15
+PROMOTION_MASK = TYPE_MASK << PROMOTION_SHIFT
+
+
+def pack_move(start: int, end: int, flags: int = 0) -> int:
+    """Pack a move from one cell index to another into an int."""
+    return start | end << CELL_BITS | flags
+
+
+def unpack_move(move: int) -> tuple[int, int]:
+    """The (start, end) cell indices of a packed move."""
+    return move & CELL_MASK, move >> CELL_BITS & CELL_MASK
+
+
+# The state of the game for the side to move, as given by `HexMap.game_status`.
+NORMAL, CHECK, CHECKMATE, STALEMATE = "normal", "check", "checkmate", "stalemate"
+
+# Conversions between piece codes and the piece names used throughout the rest of the program.
+piece_names: list[Optional[str]] = [None] * 16
+for color, color_bit in color_bits.items():
+    for name, piece_type in [("pawn", PAWN), ("knight", KNIGHT), ("bishop", BISHOP),
+                             ("rook", ROOK), ("queen", QUEEN), ("king", KING)]:
+        piece_names[piece_type | color_bit] = f"{color}_{name}"
+
+piece_codes: dict[Optional[str], int] = {name: code for code, name in enumerate(piece_names) if name is not None}
+piece_codes[None] = EMPTY
+
+# A character for every piece, used to write a board out as a string. White pieces are lower case.
+FEN_dict = {
+    None: "x",
+
+    "w_pawn": "p",
+    "b_pawn": "P",
+
+    "w_rook": "r",
+    "b_rook": "R",
+
+    "w_king": "k",
+    "b_king": "K",
+
+    "w_bishop": "b",
+    "b_bishop": "B",
+
+    "w_queen": "q",
+    "b_queen": "Q",
+
+    "w_knight": "n",
+    "b_knight": "N"
+}
+
+# The letters naming the files of the board, from left to right. As in Glinski's notation, there is no 'j' file.
+file_letters: str = "abcdefghiklmnopqrstuvwxyz"
+
+
+@lru_cache
+def zobrist_table(size: int) -> list[list[int]]:
+    """
+    Random 64-bit Zobrist keys for every piece code on every cell index of a board with `size` cells.
+    They are seeded, so every board of the same size (and every process) agrees on the keys.
+    Empty cells have a key of 0, so an empty board hashes to 0.
+    """
+    rng: random.Random = random.Random(size)
+    return [[0] * size if code == EMPTY else [rng.getrandbits(64) for _ in range(size)] for code in range(16)]
+
+
+# Mixed into the position key whenever it is Black's turn.
+zobrist_black_to_move: int = random.Random("black to move").getrandbits(64)
+
 
 class HexCoord:
     """
@@ -69,10 +155,41 @@ class HexCoord:
     The class provides operator overloads such as +, -, * and /, as well as == and !=.
     The class also provides native function overloads like round(), hash() and abs().
     This allows a Pythonic interface with hexagonal geometry.
+
+    Coordinates are immutable. The cells of Glinski's board are flyweights: making a coordinate of one, including as
+    the result of arithmetic, gives back the one canonical instance, whose `index` is its cell index on that board.
+    Any other coordinate, off the board or fractional, is a fresh instance with an `index` of -1.
     """
 
-    def __init__(self, p: float, q: float, r: float):
-        self.p, self.q, self.r = p, q, r
+    __slots__ = ("p", "q", "r", "index", "_hash")
+
+    # The canonical instances, in cell index order and by their components. Filled in below the class.
+    cells: list[HexCoord] = []
+    interned: dict[tuple[float, float, float], HexCoord] = dict()
+
+    def __new__(cls, p: float, q: float, r: float) -> HexCoord:
+        coord: Optional[HexCoord] = HexCoord.interned.get((p, q, r))
+        if coord is not None:
+            return coord
+
+        # Filled in through the slots' own setters, as `__setattr__` refuses. The hash is worked out once, up front.
+        coord = object.__new__(cls)
+        set_p(coord, p)
+        set_q(coord, q)
+        set_r(coord, r)
+        set_index(coord, -1)
+        set_hash(coord, hash((p, q, r)))
+        return coord
+
+    def __setattr__(self, name: str, value):
+        raise AttributeError(f"HexCoord is immutable, can't set {name}")
+
+    def __delattr__(self, name: str):
+        raise AttributeError(f"HexCoord is immutable, can't delete {name}")
+
+    def __reduce__(self):
+        """Pickle by components, so that unpickling interns the coordinate again."""
+        return HexCoord, (self.p, self.q, self.r)
 
     def __add__(self, other: HexCoord) -> HexCoord:
         """Vector addition between two HexCoords."""
@@ -91,8 +208,10 @@ class HexCoord:
         return HexCoord(self.p / other, self.q / other, self.r / other)
 
     def __eq__(self, other: HexCoord) -> bool:
-        """Component-wise equality check."""
-        if type(other) is not type(self):
+        """Component-wise equality check. Canonical instances are only equal to themselves."""
+        if self is other:
+            return True
+        if type(other) is not type(self) or self.index >= 0 or other.index >= 0:
             return False
 
         return self.p == other.p and self.q == other.q and self.r == other.r
@@ -127,8 +246,8 @@ class HexCoord:
         return f"HexCoord({self.p}, {self.q}, {self.r})"
 
     def __hash__(self) -> int:
-        """Unique hashing that takes into account order of values."""
-        return hash((self.p, self.q, self.r))
+        """Unique hashing that takes into account order of values, worked out when the coordinate is made."""
+        return self._hash
 
     def __abs__(self) -> HexCoord:
         """
@@ -139,12 +258,33 @@ class HexCoord:
 
     def __iter__(self) -> iter:
         """Return an iterator over the coordinate's components."""
-        return iter([self.p, self.q, self.r])
+        return iter((self.p, self.q, self.r))
 
     def mag(self) -> float:
         return math.sqrt(self.p**2 + self.q**2 + self.r**2)
 
 
+# The slots' own setters, which fill in coordinates without going through `HexCoord.__setattr__`.
+set_p, set_q, set_r = HexCoord.p.__set__, HexCoord.q.__set__, HexCoord.r.__set__
+set_index, set_hash = HexCoord.index.__set__, HexCoord._hash.__set__
+
+# The radius of Glinski's board, whose cells are interned.
+GLINSKI_RADIUS: int = 5
+
+
+def intern_cells(radius: int):
+    """Make the canonical coordinates of a board's cells, in the same cell index order as `HexMap.from_radius`."""
+    for p in range(-radius, radius + 1):
+        for q in range(max(-radius, -radius - p), min(radius, radius - p) + 1):
+            coord: HexCoord = HexCoord(p, q, -p - q)
+            set_index(coord, len(HexCoord.cells))
+            HexCoord.cells.append(coord)
+            HexCoord.interned[p, q, -p - q] = coord
+
+
+intern_cells(GLINSKI_RADIUS)
+
+
 class HexCell:
     """A class to group a coordinate on the board and it's corresponding state."""
     def __init__(self, coord: HexCoord, state=None):
@@ -159,34 +299,62 @@ class HexMap:
     This class overloads operators like `in` and `[]`.
     It also overloads native functions like iter() to allow iteration over a board.
     This provides an easier interface to the board.
+
+    The position itself is stored compactly as a `bytearray` of piece codes, one byte per cell index.
     """
 
-    def __init__(self, cells=None):
-        if cells is None:
-            cells = dict()
-        self.cells: dict[int, HexCell] = cells
-        self.coord_to_cell_registry: dict[HexCoord, int] = dict()
+    # The geometry tables built so far, by number of cells.
+    table_cache: dict[int, list[Optional[list[list[list[int]]]]]] = dict()
+
+    # The evaluation tables built so far, by number of cells.
+    square_value_cache: dict[int, list[list[int]]] = dict()
+
+    def __init__(self, coords: Optional[list[HexCoord]] = None):
+        if coords is None:
+            coords = []
+        self.coords: list[HexCoord] = coords
+        self.coord_to_cell_registry: dict[HexCoord, int] = {coord: i for i, coord in enumerate(coords)}
+
+        # Whether the cells are Glinski's board in its usual order, so a coordinate's cell index is its `index`.
+        self.interned: bool = coords == HexCoord.cells
+        self.radius: int = max((coord.p for coord in coords), default=0)
+        self.board: bytearray = bytearray(len(coords))
         self.ply: int = 0
 
-        self.__hash__ = self.__str__
+        # The Zobrist key of the pieces on the board, kept up to date as pieces are set, pushed and popped.
+        self.zobrist: list[list[int]] = zobrist_table(len(coords))
+        self.board_key: int = 0
+
+        # The evaluation of each piece code on each cell from White's point of view, from `evaluation`, and the running
+        # total for the position. Like the key, the score is kept up to date as pieces are set, pushed and popped.
+        if len(coords) not in HexMap.square_value_cache:
+            HexMap.square_value_cache[len(coords)] = self.build_square_values()
+        self.square_values: list[list[int]] = HexMap.square_value_cache[len(coords)]
+        self.score: int = 0
+
+        # Every move made with `push`, as (start, end, captured piece code), so that `pop` can undo it.
+        self.undo_stack: list[tuple[int, int, int]] = []
+
+        # For every piece code, cell index and move vector, the cell indices along that vector with off-board cells
+        # removed. Non-sliding pieces only get the first step of each vector. Filled in by `build_tables`.
+        self.ray_table: list[Optional[list[list[list[int]]]]] = [None] * 16
 
     def __iter__(self):
-        """Return an iterator over the `HexCoord`s in the map."""
-        return iter(self.cells.values())
+        """Return an iterator over the cells in the map, as `HexCell`s."""
+        return (HexCell(coord, piece_names[piece]) for coord, piece in zip(self.coords, self.board))
 
     def __getitem__(self, item: Union[int, HexCoord]) -> Optional[str]:
         """Get the state at a specific `HexCoord` in the map."""
-        if type(item) is HexCoord:
-            return self.cells[self.coord_to_cell_registry[item]].state
-        elif type(item) is int:
-            return self.cells[item].state
+        return piece_names[self.board[self.index_of(item)]]
 
     def __setitem__(self, key: Union[int, HexCoord], value: Optional[str]):
         """Set the state at a specific `HexCoord` in the map."""
-        if type(key) is HexCoord:
-            self.cells[self.coord_to_cell_registry[key]].state = value
-        elif type(key) is int:
-            self.cells[key].state = value
+        index: int = self.index_of(key)
+        piece: int = piece_codes[value]
+
+        self.board_key ^= self.zobrist[self.board[index]][index] ^ self.zobrist[piece][index]
+        self.score += self.square_values[piece][index] - self.square_values[self.board[index]][index]
+        self.board[index] = piece
 
     def __contains__(self, item: HexCoord) -> bool:
         """
@@ -194,54 +362,176 @@ class HexMap:
         This is useful for out of board checks.
         """
         if type(item) is HexCoord:
-            return item in self.coord_to_cell_registry.keys()
+            return item in self.coord_to_cell_registry
         elif type(item) is int:
-            return item in self.cells.keys()
-
-    def __str__(self) -> str:
-        FEN_dict = {
-            None: "x",
-
-            "w_pawn": "p",
-            "b_pawn": "P",
-
-            "w_rook": "r",
-            "b_rook": "R",
+            return 0 <= item < len(self.board)
 
-            "w_king": "k",
-            "b_king": "K",
-
-            "w_bishop": "b",
-            "b_bishop": "B",
-
-            "w_queen": "q",
-            "b_queen": "Q",
-
-            "w_knight": "n",
-            "b_knight": "N"
-        }
+    def __hash__(self) -> int:
+        """Hash by the position key, which is kept up to date as moves are made."""
+        return self.key
 
+    def __str__(self) -> str:
         hash_str = ""
-        for i in range(91):
+        for i in range(len(self.board)):
             hash_str += FEN_dict[self[i]]
         return hash_str
 
+    @property
+    def key(self) -> int:
+        """The 64-bit Zobrist key of the position, including the side to move. This is an O(1) read."""
+        if self.ply % 2:
+            return self.board_key ^ zobrist_black_to_move
+        return self.board_key
+
+    def compute_key(self) -> int:
+        """Recompute the Zobrist key of the position from scratch. Useful to check the incremental key."""
+        board_key: int = 0
+        for index, piece in enumerate(self.board):
+            board_key ^= self.zobrist[piece][index]
+        return board_key ^ zobrist_black_to_move if self.ply % 2 else board_key
+
+    def compute_score(self) -> int:
+        """Recompute the evaluation of the position from scratch. Useful to check the incremental score."""
+        return sum(self.square_values[piece][index] for index, piece in enumerate(self.board))
+
+    def build_square_values(self) -> list[list[int]]:
+        """Build the evaluation of every piece code on every cell, from White's point of view."""
+        table: list[list[int]] = [[0] * len(self.coords) for _ in range(16)]
+        for code, name in enumerate(piece_names):
+            if name is not None:
+                sign: int = 1 if name[0] == "w" else -1
+                table[code] = [sign * evaluation.square_value(name, *coord, self.radius) for coord in self.coords]
+        return table
+
+    def index_of(self, item: Union[int, HexCoord]) -> int:
+        """Get the cell index of a `HexCoord`. Cell indices are passed straight through."""
+        if type(item) is int:
+            return item
+        if self.interned and item.index >= 0:
+            return item.index
+        return self.coord_to_cell_registry[item]
+
+    def cell_name(self, cell: Union[int, HexCoord]) -> str:
+        """
+        Name a cell in Glinski's notation: a file letter, then the rank counted up from White's edge of the file.
+        For example, White's king starts on g1.
+        """
+        coord: HexCoord = self.coords[self.index_of(cell)]
+        lowest_q: int = max(-self.radius, -self.radius - coord.p)
+        return f"{file_letters[coord.p + self.radius]}{coord.q - lowest_q + 1}"
+
+    def parse_cell(self, name: str) -> int:
+        """Get the cell index of a cell named in Glinski's notation. Raises `ValueError` if there is no such cell."""
+        if len(name) < 2 or name[0] not in file_letters or not name[1:].isdigit():
+            raise ValueError(f"Not a cell name: {name!r}")
+
+        p: int = file_letters.index(name[0]) - self.radius
+        q: int = max(-self.radius, -self.radius - p) + int(name[1:]) - 1
+        coord: HexCoord = HexCoord(p, q, -p - q)
+
+        if coord not in self:
+            raise ValueError(f"Not a cell on the board: {name!r}")
+        return self.coord_to_cell_registry[coord]
+
+    def move_name(self, move: tuple[Union[int, HexCoord], Union[int, HexCoord]]) -> str:
+        """Name a (start, end) move by its two cells, for example 'f5f6'."""
+        return self.cell_name(move[0]) + self.cell_name(move[1])
+
+    def parse_move(self, name: str) -> tuple[int, int]:
+        """Get the (start, end) cell indices of a move named like 'f5f6'. Raises `ValueError` if it can't be read."""
+        split: int = next((i for i in range(2, len(name)) if name[i].isalpha()), 0)
+        if not split:
+            raise ValueError(f"Not a move: {name!r}")
+        return self.parse_cell(name[:split]), self.parse_cell(name[split:])
+
+    @staticmethod
+    def from_str(board_str: str, ply: int = 0) -> HexMap:
+        """Rebuild a `HexMap` from the string written by `str()`, with White to move on even plies."""
+        states: dict[str, Optional[str]] = {char: state for state, char in FEN_dict.items()}
+        radius: int = next(r for r in range(len(board_str)) if 3 * r * (r + 1) + 1 == len(board_str))
+
+        hex_map: HexMap = HexMap.from_radius(radius)
+        for index, char in enumerate(board_str):
+            hex_map[index] = states[char]
+        hex_map.ply = ply
+        return hex_map
+
     @staticmethod
     def from_radius(radius: int) -> HexMap:
         """
         Generate a `HexMap` of a certain radius.
         This provides a useful lemma to build the Glinski variant.
         """
-        hex_map = HexMap()
-        i = 0
+        coords: list[HexCoord] = []
         for p in range(-radius, radius + 1):
             for q in range(-radius, radius + 1):
                 for r in range(-radius, radius + 1):
                     if p + q + r == 0:
-                        coord = HexCoord(p, q, r)
-                        hex_map.coord_to_cell_registry[copy.deepcopy(coord)] = i
-                        hex_map.cells[i] = HexCell(coord)
-                        i += 1
+                        coords.append(HexCoord(p, q, r))
+
+        hex_map = HexMap(coords)
+        hex_map.build_tables()
+        return hex_map
+
+    def build_tables(self):
+        """
+        Precompute the geometry tables used by move generation and check detection.
+        This runs once when the board is made, so that searching only has to walk plain lists of cell indices.
+        The tables never change, so every board of the same size shares them.
+        """
+        if len(self.coords) in HexMap.table_cache:
+            self.ray_table = HexMap.table_cache[len(self.coords)]
+            return
+
+        # Pieces of both colours that share move vectors also share their table.
+        tables_by_vectors: dict[int, list[list[list[int]]]] = dict()
+
+        for piece, vectors in move_vectors.items():
+            if id(vectors) in tables_by_vectors:
+                self.ray_table[piece_codes[piece]] = tables_by_vectors[id(vectors)]
+                continue
+
+            is_sliding: bool = piece[2:] not in ["king", "pawn", "knight"]
+            table: list[list[list[int]]] = []
+
+            for coord in self.coords:
+                rays: list[list[int]] = []
+                for vector in vectors:
+                    vector: HexCoord = HexCoord(*vector)
+                    curr_hex: HexCoord = coord
+                    ray: list[int] = []
+
+                    while True:
+                        curr_hex += vector
+                        if curr_hex not in self:
+                            break
+                        ray.append(self.coord_to_cell_registry[curr_hex])
+                        if not is_sliding:
+                            break
+
+                    rays.append(ray)
+                table.append(rays)
+
+            tables_by_vectors[id(vectors)] = table
+            self.ray_table[piece_codes[piece]] = table
+
+        HexMap.table_cache[len(self.coords)] = self.ray_table
+
+    def to_bytes(self) -> bytes:
+        """A compact encoding of the position: one piece code per cell, then the ply. It is cheap to send around."""
+        return bytes(self.board) + self.ply.to_bytes(4, "little")
+
+    @staticmethod
+    def from_bytes(data: bytes) -> HexMap:
+        """Rebuild a `HexMap` from the encoding made by `to_bytes`."""
+        size: int = len(data) - 4
+        radius: int = next(r for r in range(size) if 3 * r * (r + 1) + 1 == size)
+
+        hex_map: HexMap = HexMap.from_radius(radius)
+        hex_map.board[:] = data[:size]
+        hex_map.board_key = hex_map.compute_key()
+        hex_map.score = hex_map.compute_score()
+        hex_map.ply = int.from_bytes(data[size:], "little")
         return hex_map
 
     @staticmethod
@@ -266,7 +556,7 @@ class HexMap:
         }
 
         # Generate an initial foundation board.
-        initial_map: HexMap = HexMap.from_radius(5)
+        initial_map: HexMap = HexMap.from_radius(GLINSKI_RADIUS)
 
         # Add all the pieces onto the board, following Glinski layout.
         for key, pos_list in glinski_pos.items():
@@ -278,197 +568,359 @@ class HexMap:
     def generate_moves(self, start: HexCoord) -> list[HexCoord]:
         """
         Generates all moves from a specified start coord.
-        It travels along predefined vectors and checks certain conditions about whether it should stop.
+        The moves come from the legal move generator, so every one of them is safe for the king.
         """
 
-        start_state: Optional[str] = self[start]
+        start_index: int = self.index_of(start)
+        start_piece: int = self.board[start_index]
 
         # If there is nothing at the coord, there are no moves logically available to make.
-        if start_state is None:
+        if start_piece == EMPTY:
             return []
 
         # A piece can always move back to where it started.
-        valid_moves: list[HexCoord] = [start]
+        valid_moves: list[HexCoord] = [self.coords[start_index]]
 
-        for ray in move_vectors[start_state]:
+        for _, end_index in self.legal_moves(piece_names[start_piece][0], start_index):
+            valid_moves.append(self.coords[end_index])
 
-            # Convert the 3-tuple into a `HexCoord` to take advantage of its overloaded operators and methods.
-            ray: HexCoord = HexCoord(*ray)
-            curr_hex: HexCoord = start
+        return valid_moves
 
-            while True:
+    def check_lines(self, color: str) -> tuple[Optional[int], dict[int, set[int]], Optional[set[int]], int]:
+        """
+        Finds what constrains a colour's moves: its king's cell, the pinned pieces with the line each may still move
+        along (from the king up to and including the pinner), the cells that block or capture a check (None when not
+        in check), and how many pieces give check.
+        """
+        board: bytearray = self.board
+        color_bit: int = color_bits[color]
+        enemy_bit: int = color_bit ^ BLACK
+        king: int = KING | color_bit
+
+        # For each pinned piece, the cells it may still move to: the line from the king up to and including the pinner.
+        pin_lines: dict[int, set[int]] = dict()
+
+        # When in check, the cells a piece other than the king may move to: the line up to and including the checker.
+        block_cells: Optional[set[int]] = None
+        checkers: int = 0
+
+        king_index: Optional[int] = board.index(king) if king in board else None
+        if king_index is not None:
+
+            # Look outward from the king along every line a sliding piece could attack it down.
+            for piece_type in [ROOK, BISHOP]:
+                attackers: tuple[int, int] = (piece_type | enemy_bit, QUEEN | enemy_bit)
+                for ray in self.ray_table[piece_type][king_index]:
+                    own_index: Optional[int] = None
+                    for n, end_index in enumerate(ray):
+                        end_piece: int = board[end_index]
+                        if end_piece == EMPTY:
+                            continue
+
+                        # The first friendly piece on the line might be pinned, but a second one shields it.
+                        if end_piece & BLACK == color_bit:
+                            if own_index is not None:
+                                break
+                            own_index = end_index
+                            continue
+
+                        # The first enemy piece on the line either checks the king, pins a piece or does nothing.
+                        if end_piece in attackers:
+                            if own_index is None:
+                                checkers += 1
+                                block_cells = set(ray[:n + 1])
+                            else:
+                                pin_lines[own_index] = set(ray[:n + 1])
+                        break
 
-                # Travel one along the vector.
-                curr_hex += ray
+            # Knights and pawns can only be dealt with by capturing them. Enemy pawns attack the king from wherever a
+            # friendly pawn on the king's cell could capture.
+            for piece_type, rays in [(KNIGHT, self.ray_table[KNIGHT][king_index]),
+                                     (PAWN, self.ray_table[PAWN | color_bit][king_index][1:])]:
+                for ray in rays:
+                    if ray and board[ray[0]] == piece_type | enemy_bit:
+                        checkers += 1
+                        block_cells = {ray[0]}
 
-                # Is the coord I'm at out of bounds? If so, stop moving along this line.
-                if curr_hex not in self:
-                    break
+        return king_index, pin_lines, block_cells, checkers
 
-                # If the piece at the coord is the same colour as me, stop moving along this line.
-                if self[curr_hex] is not None and self[curr_hex][0] == start_state[0]:
-                    break
+    def legal_moves(self, color: str, start: Optional[Union[int, HexCoord]] = None,
+                    captures: bool = True, quiets: bool = True) -> list[tuple[int, int]]:
+        """
+        Generates every legal move for a colour as (start, end) cell index pairs, optionally only from one cell.
+        Either the captures or the quiet (non-capturing) moves can be left out.
+        """
+        return [(move & CELL_MASK, move >> CELL_BITS & CELL_MASK)
+                for move in self.legal_move_codes(color, None, start, captures, quiets)]
 
-                # If the king is in check after this move:
-                if self.is_king_checked_after_move(start_state[0], start, curr_hex):
-                    # King, Pawn and Knight are not sliding pieces, so they must check the next vector immediately.
-                    if start_state[2:] in ["king", "pawn", "knight"]:
-                        break
-                    # Every other piece is a sliding piece, so we can still check along this line for moves.
-                    else:
-                        continue
+    def legal_move_codes(self, color: str, moves: Optional[array] = None, start: Optional[Union[int, HexCoord]] = None,
+                         captures: bool = True, quiets: bool = True) -> array:
+        """
+        Generates every legal move for a colour as packed moves, with the `CAPTURE` flag on captures, into an
+        `array("I")`. Passing in the same array each time reuses it, rather than allocating a new list of moves.
+        Checkers and pinned pieces are found once, up front, so no move has to be made and tested for check:
+        pinned pieces only move along their pin line, and in check only king moves, blocks and captures of the checker
+        are produced.
+        """
+        if moves is None:
+            moves = array("I")
+        else:
+            del moves[:]
+        append = moves.append
+        capture: int = CAPTURE  # Looked up locally, as this loop is hot.
+        cell_bits: int = CELL_BITS
+
+        board: bytearray = self.board
+        color_bit: int = color_bits[color]
+        enemy_color: str = "b" if color == "w" else "w"
+        enemy_bit: int = color_bit ^ BLACK
+        king: int = KING | color_bit
+        _, pin_lines, block_cells, checkers = self.check_lines(color)
+
+        if start is None:
+            start_indices: Union[range, list[int]] = range(len(board))
+        else:
+            start_indices = [self.index_of(start)]
 
-                # Special handling for the quirks of the pawn pieces
-                if start_state.endswith("pawn"):
-                    offset: HexCoord = curr_hex - start
-                    if start_state[0] == "w":
+        for start_index in start_indices:
+            start_piece: int = board[start_index]
+            if start_piece == EMPTY or start_piece & BLACK != color_bit:
+                continue
 
-                        # If the offset is a 'diagonal' attack move but there's nothing there to attack:
-                        if offset in [HexCoord(-1, 1, 0), HexCoord(1, 0, -1)] and self[curr_hex] is None:
-                            break
+            # The king may step anywhere that isn't attacked once it has moved. It is lifted off the board while
+            # checking, so that it can't hide behind itself on a line it is being checked along.
+            if start_piece == king:
+                board[start_index] = EMPTY
+                for ray in self.ray_table[king][start_index]:
+                    if ray:
+                        end_index: int = ray[0]
+                        end_piece: int = board[end_index]
+                        if (quiets if end_piece == EMPTY else captures and end_piece & BLACK == enemy_bit) and \
+                                not self.is_square_attacked(end_index, enemy_color):
+                            append(start_index | end_index << cell_bits | (end_piece and capture))
+                board[start_index] = start_piece
+                continue
 
-                        # If the offset is a 'forward' normal move but there's an enemy piece in the way:
-                        if offset == HexCoord(0, 1, -1) and self[curr_hex] is not None:
-                            break
-                    elif start_state[0] == "b":
+            # In double check, only the king can move.
+            if checkers > 1:
+                continue
 
-                        # If the offset is a 'diagonal' attack move but there's nothing there to attack:
-                        if offset in [HexCoord(-1, 0, 1), HexCoord(1, -1, 0)] and self[curr_hex] is None:
-                            break
+            allowed: Optional[set[int]] = pin_lines.get(start_index)
+            if block_cells is not None:
+                allowed = block_cells if allowed is None else allowed & block_cells
 
-                        # If the offset is a 'forward' normal move but there's an enemy piece in the way:
-                        if offset == HexCoord(0, -1, 1) and self[curr_hex] is not None:
-                            break
+            is_pawn: bool = start_piece & TYPE_MASK == PAWN
+            for ray_number, ray in enumerate(self.ray_table[start_piece][start_index]):
+                for end_index in ray:
+                    end_piece: int = board[end_index]
 
-                # The move passed all checks, so add it to the valid moves list.
-                valid_moves.append(curr_hex)
+                    # If the piece at the cell is the same colour as me, stop moving along this line.
+                    if end_piece != EMPTY and end_piece & BLACK == color_bit:
+                        break
 
-                # If this is true, it must be the case that there is an enemy piece, so we can't travel any further
-                # along this vector.
-                if self[curr_hex] is not None:
-                    break
+                    # Special handling for the quirks of the pawn pieces. The first pawn vector is the 'forward'
+                    # normal move, which can't capture. The others are 'diagonal' attack moves, which must capture.
+                    if is_pawn and (ray_number == 0) != (end_piece == EMPTY):
+                        break
 
-                # King, Pawn and Knight can only move along their vectors once: they are not sliding pieces.
-                # This will run on the first loop of any vector, stopping sliding behaviour for them.
-                if start_state[2:] in ["king", "pawn", "knight"]:
-                    break
+                    if (quiets if end_piece == EMPTY else captures) and (allowed is None or end_index in allowed):
+                        append(start_index | end_index << cell_bits | (end_piece and capture))
 
-        return valid_moves
+                    # If this is true, it must be the case that there is an enemy piece, so we can't travel any
+                    # further along this vector.
+                    if end_piece != EMPTY:
+                        break
+
+        return moves
 
     def cells_with_state_col(self, color: str) -> list[HexCell]:
         """Return all cells that have a piece of specified colour."""
+        color_bit: int = color_bits[color]
         valid_cells: list[HexCell] = []
-        for cell in self:
-            if cell.state is not None and cell.state.startswith(color):
-                valid_cells.append(cell)
+        for coord, piece in zip(self.coords, self.board):
+            if piece != EMPTY and piece & BLACK == color_bit:
+                valid_cells.append(HexCell(coord, piece_names[piece]))
         return valid_cells
 
     def moves_for_col(self, color: str) -> tuple[HexCoord, HexCoord]:
-        for cell in self.cells_with_state_col(color):
-            for coord in self.generate_moves(cell.coord):
-                if cell.coord != coord:
-                    yield cell.coord, coord
+        for start_index, end_index in self.legal_moves(color):
+            yield self.coords[start_index], self.coords[end_index]
 
-    def make_move(self, start: HexCoord, end: HexCoord):
-        """Performs the move from `start` to `end`. Handles ply incrementing and piece movement."""
-        if start == end:
-            return
+    def push(self, move: tuple[Union[int, HexCoord], Union[int, HexCoord]]):
+        """Performs a (start, end) move and records it, along with any capture, so that `pop` can undo it."""
+        self.push_move(self.index_of(move[0]) | self.index_of(move[1]) << CELL_BITS)
 
-        self[end] = self[start]
-        self[start] = None
+    def push_move(self, move: int):
+        """Performs a packed move, like `push`. Its flags are ignored, as the board says what is captured."""
+        start: int = move & CELL_MASK
+        end: int = move >> CELL_BITS & CELL_MASK
 
-        self.ply += 1
+        piece: int = self.board[start]
+        captured: int = self.board[end]
 
-    def is_king_checked(self, color: str) -> bool:
-        """Checks if a king of specified colour is in check right now."""
+        self.undo_stack.append((start, end, captured))
+        self.board[end] = piece
+        self.board[start] = EMPTY
 
-        # The coordinate that the king is on must be found, to check enemy moves against.
-        king_coords: Optional[HexCoord] = None
-        for cell in self:
-            if cell.state == f"{color}_king":
-                king_coords = cell.coord
+        self.board_key ^= self.zobrist[piece][start] ^ self.zobrist[piece][end] ^ self.zobrist[captured][end]
+        self.score += self.square_values[piece][end] - self.square_values[piece][start] \
+            - self.square_values[captured][end]
 
-        # Iterate over the cells dictionary, over key-pair values.
-        for coord, cell in self.cells.items():
+        self.ply += 1
 
-            # If there is nothing at that cell, there is no need to check if it can threaten the king.
-            if cell.state is None:
-                continue
+    def pop(self) -> tuple[int, int]:
+        """Undoes the last move made with `push`, restoring any captured piece. Returns the undone move."""
+        start, end, captured = self.undo_stack.pop()
+        piece: int = self.board[end]
 
-            # If the piece is of the same colour as the king, it is certain not to threaten it.
-            if cell.state[0] == color:
-                continue
+        self.board[start] = piece
+        self.board[end] = captured
 
-            # This piece must certainly now be an enemy piece, so iterate over its 'move vectors':
-            for ray in move_vectors[cell.state]:
-                # Convert the 3-tuple into a `HexCoord` to take advantage of its overloaded operators and methods.
-                ray: HexCoord = HexCoord(*ray)
-                curr_hex: HexCoord = cell.coord
+        self.board_key ^= self.zobrist[piece][start] ^ self.zobrist[piece][end] ^ self.zobrist[captured][end]
+        self.score += self.square_values[piece][start] - self.square_values[piece][end] \
+            + self.square_values[captured][end]
 
-                while True:
+        self.ply -= 1
+        return start, end
 
-                    # Travel one along the vector.
-                    curr_hex += ray
+    def coords_to_move(self, start: HexCoord, end: HexCoord) -> int:
+        """Pack a move between two `HexCoord`s, flagging it as a capture if there is a piece on `end`."""
+        start_index: int = self.index_of(start)
+        end_index: int = self.index_of(end)
+        return pack_move(start_index, end_index, CAPTURE if self.board[end_index] != EMPTY else 0)
 
-                    # Is the coord I'm at out of bounds? If so, stop moving along this line.
-                    if curr_hex not in self:
-                        break
+    def move_to_coords(self, move: int) -> tuple[HexCoord, HexCoord]:
+        """The start and end `HexCoord`s of a packed move."""
+        return self.coords[move & CELL_MASK], self.coords[move >> CELL_BITS & CELL_MASK]
 
-                    # If the piece at the coord is the same colour as me, stop moving along this line.
-                    if self[curr_hex] is not None and self[curr_hex][0] == cell.state[0]:
+    def make_move(self, start: HexCoord, end: HexCoord):
+        """Performs the move from `start` to `end`. Handles ply incrementing and piece movement."""
+        if start == end:
+            return
+
+        self.push((start, end))
+
+    def is_square_attacked(self, cell: Union[int, HexCoord], by_color: str) -> bool:
+        """
+        Checks if a cell is attacked by any piece of specified colour.
+        Rather than trying every enemy piece, it looks outward from the cell along each attack pattern in reverse, and
+        stops at the first piece on each line.
+        """
+        index: int = self.index_of(cell)
+        color_bit: int = color_bits[by_color]
+
+        # Sliding attackers: the first piece along a line attacks the cell if it can slide back along that line.
+        for piece_type in [ROOK, BISHOP]:
+            attackers: tuple[int, int] = (piece_type | color_bit, QUEEN | color_bit)
+            for ray in self.ray_table[piece_type][index]:
+                for end_index in ray:
+                    end_piece: int = self.board[end_index]
+                    if end_piece != EMPTY:
+                        if end_piece in attackers:
+                            return True
                         break
 
-                    # Special handling for the quirks of the pawn pieces
-                    if cell.state.endswith("pawn"):
-                        offset: HexCoord = curr_hex - cell.coord
+        # Pawns attack the cell from wherever an enemy pawn on the cell could capture.
+        pawn_rays: list[list[int]] = self.ray_table[PAWN | (color_bit ^ BLACK)][index][1:]
 
-                        # We only need to check that the offset is an attack, since pawns cannot threaten forwards.
-                        if cell.state[0] == "w":
-                            if offset not in [HexCoord(-1, 1, 0), HexCoord(1, 0, -1)]:
-                                break
-                        elif cell.state[0] == "b":
-                            if offset not in (HexCoord(-1, 0, 1), HexCoord(1, -1, 0)):
-                                break
+        # Non-sliding attackers only need the first step of each vector.
+        for piece_type, rays in [(KNIGHT, self.ray_table[KNIGHT][index]),
+                                 (KING, self.ray_table[KING][index]),
+                                 (PAWN, pawn_rays)]:
+            for ray in rays:
+                if ray and self.board[ray[0]] == piece_type | color_bit:
+                    return True
 
-                    # The move passed all checks, so if it threatens the king, the king is in check.
-                    if curr_hex == king_coords:
-                        return True
+        return False
 
-                    # If this is true, it must be the case that its an enemy piece other than the king, so we can't
-                    # travel any further along this vector.
-                    elif self[curr_hex] is not None:
-                        break
+    def is_king_checked(self, color: str) -> bool:
+        """Checks if a king of specified colour is in check right now."""
+        king: int = KING | color_bits[color]
 
-                    # King, Pawn and Knight can only move along their vectors once: they are not sliding pieces.
-                    # This will run on the first loop of any vector, stopping sliding behaviour for them.
-                    elif cell.state[2:] in ["king", "pawn", "knight"]:
-                        break
+        # If there is no king, there is nothing to be in check.
+        if king not in self.board:
+            return False
 
-        # The king is not in check.
-        return False
+        return self.is_square_attacked(self.board.index(king), "b" if color == "w" else "w")
 
     def is_king_checkmated(self, color: str) -> bool:
         """Checks if a king of specified colour is checkmated."""
 
-        # If the king isn't even checked, there's no need checking for checkmate.
-        if self.is_king_checked(color):
+        # If the king isn't even checked, there's no need checking for checkmate. Otherwise, if none of the pieces have
+        # a legal move, that must be because they don't get the king out of check, so the king is helpless.
+        return self.is_king_checked(color) and not self.has_any_legal_move(color)
 
-            # If none of the pieces can make moves other than move back to start, that must be because they don't get
-            # the king out of check. Hence, the king is helpless and checkmated.
-            if all(len(self.generate_moves(cell.coord)) == 1 for cell in self.cells_with_state_col(color)):
-                return True
-        return False
+    def has_any_legal_move(self, color: str) -> bool:
+        """
+        Checks if a colour has any legal move at all, stopping at the first one found, which is far cheaper than
+        generating them all. King moves are tried first, as they are the only way out of a double check, and then,
+        when in check, captures of the checker.
+        """
+        board: bytearray = self.board
+        color_bit: int = color_bits[color]
+        enemy_color: str = "b" if color == "w" else "w"
+        enemy_bit: int = color_bit ^ BLACK
+        king: int = KING | color_bit
+        king_index, pin_lines, block_cells, checkers = self.check_lines(color)
+
+        # The king is lifted off the board while checking, just as in `legal_moves`.
+        if king_index is not None:
+            board[king_index] = EMPTY
+            try:
+                for ray in self.ray_table[king][king_index]:
+                    if ray and (board[ray[0]] == EMPTY or board[ray[0]] & BLACK == enemy_bit) and \
+                            not self.is_square_attacked(ray[0], enemy_color):
+                        return True
+            finally:
+                board[king_index] = king
 
-    def is_king_checked_after_move(self, color: str, start: HexCoord, end: HexCoord) -> bool:
-        """Checks if a king of specified colour will be in check after a move."""
+        if checkers > 1:
+            return False
 
-        prev_state: Optional[str] = self[end]
+        # In check, the checker is the one enemy piece among the cells that deal with the check.
+        targets_in_turn: list[Optional[set[int]]] = [block_cells]
+        if block_cells is not None:
+            targets_in_turn.insert(0, {cell for cell in block_cells if board[cell] != EMPTY})
+
+        for targets in targets_in_turn:
+            for start_index, start_piece in enumerate(board):
+                if start_piece == EMPTY or start_piece & BLACK != color_bit or start_piece == king:
+                    continue
+
+                allowed: Optional[set[int]] = pin_lines.get(start_index)
+                if targets is not None:
+                    allowed = targets if allowed is None else allowed & targets
+
+                is_pawn: bool = start_piece & TYPE_MASK == PAWN
+                for ray_number, ray in enumerate(self.ray_table[start_piece][start_index]):
+                    for end_index in ray:
+                        end_piece: int = board[end_index]
+                        if end_piece != EMPTY and end_piece & BLACK == color_bit:
+                            break
+                        if is_pawn and (ray_number == 0) != (end_piece == EMPTY):
+                            break
+                        if allowed is None or end_index in allowed:
+                            return True
+                        if end_piece != EMPTY:
+                            break
+        return False
 
-        self.make_move(start, end)
+    def game_status(self, color: str) -> str:
+        """
+        The state of the game for a colour to move: `CHECKMATE` or `STALEMATE` when it has no legal moves, otherwise
+        `CHECK` or `NORMAL`.
+        """
+        checked: bool = self.is_king_checked(color)
+        if self.has_any_legal_move(color):
+            return CHECK if checked else NORMAL
+        return CHECKMATE if checked else STALEMATE
+
+    def is_king_checked_after_move(self, color: str, start: Union[int, HexCoord], end: Union[int, HexCoord]) -> bool:
+        """Checks if a king of specified colour will be in check after a move."""
+        self.push((start, end))
         result: bool = self.is_king_checked(color)
-        self.make_move(end, start)
+        self.pop()
 
-        self[end] = prev_state
         return result
 
 
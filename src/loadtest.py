@@ -0,0 +1,106 @@
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import time
+from typing import Optional
+
+
+async def request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, message: dict) -> dict:
+    """Send one request to the game server, and wait for its answer."""
+    writer.write(json.dumps(message).encode() + b"\n")
+    await writer.drain()
+    return json.loads(await reader.readline())
+
+
+async def connect(host: str, port: int, unix: Optional[str]) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+    if unix is not None:
+        return await asyncio.open_unix_connection(unix)
+    return await asyncio.open_connection(host, port)
+
+
+async def play_game(game: int, host: str, port: int, unix: Optional[str], max_moves: int,
+                    latencies: list[float]) -> dict:
+    """
+    Play one simulated game, as a human making random legal moves, each game over its own connection. Returns the
+    final state, and adds the time each accepted move took to answer to `latencies`.
+    """
+    rng: random.Random = random.Random(game)
+    reader, writer = await connect(host, port, unix)
+    try:
+        state: dict = await request(reader, writer, {"op": "new", "color": "w" if game % 2 == 0 else "b"})
+        moves: int = 0
+        while moves < max_moves:
+            if "error" in state or state["result"] is not None or not state["legal_moves"]:
+                break
+            move: str = rng.choice(state["legal_moves"])
+
+            # Moves turned away while the server is busy are tried again, without counting towards the figures.
+            while True:
+                start_time: float = time.perf_counter()
+                answer: dict = await request(reader, writer, {"op": "move", "game": state["game"], "move": move})
+                if "busy" not in answer.get("error", ""):
+                    break
+                await asyncio.sleep(0.1)
+
+            if "error" not in answer:
+                latencies.append(time.perf_counter() - start_time)
+                moves += 1
+            state = answer
+
+        if "game" in state:
+            await request(reader, writer, {"op": "close", "game": state["game"]})
+        return state
+    finally:
+        writer.close()
+
+
+async def run_load_test(games: int, host: str = "127.0.0.1", port: int = 8765, unix: Optional[str] = None,
+                        max_moves: int = 20) -> dict:
+    """
+    Play some games against the server at once, and return the figures: how many moves were played, how quickly,
+    and the latency of each move in milliseconds, along with the server's own metrics at the end.
+    """
+    latencies: list[float] = []
+    start_time: float = time.perf_counter()
+    states: list[dict] = await asyncio.gather(*(
+        play_game(game, host, port, unix, max_moves, latencies) for game in range(games)
+    ))
+    seconds: float = time.perf_counter() - start_time
+
+    reader, writer = await connect(host, port, unix)
+    server_metrics: dict = await request(reader, writer, {"op": "metrics"})
+    writer.close()
+
+    ordered: list[float] = sorted(latencies) or [0.0]
+    return {
+        "games": games,
+        "errors": sum("error" in state for state in states),
+        "finished": sum(state.get("result") is not None for state in states),
+        "moves": len(latencies),
+        "seconds": round(seconds, 3),
+        "moves_per_second": round(len(latencies) / seconds, 3) if seconds else 0.0,
+        "latency_ms": {
+            "mean": round(statistics.fmean(ordered) * 1000, 3),
+            "p50": round(ordered[len(ordered) // 2] * 1000, 3),
+            "p95": round(ordered[int(len(ordered) * 0.95)] * 1000, 3),
+            "max": round(ordered[-1] * 1000, 3),
+        },
+        "server": server_metrics,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate many concurrent games against a running game server.")
+    parser.add_argument("--games", type=int, default=50, help="games to play at once")
+    parser.add_argument("--moves", type=int, default=20, help="moves the simulated human plays in each game")
+    parser.add_argument("--host", default="127.0.0.1", help="server address")
+    parser.add_argument("--port", type=int, default=8765, help="server TCP port")
+    parser.add_argument("--unix", default=None, help="connect over a Unix socket at this path instead")
+    args = parser.parse_args()
+
+    report: dict = asyncio.run(run_load_test(args.games, args.host, args.port, args.unix, args.moves))
+    print(json.dumps(report, indent=4))
+    print(f"{report['moves']} moves in {report['seconds']}s across {args.games} games", file=sys.stderr)
@@ -1,10 +1,16 @@
+import os
 from typing import Optional
 
 import pygame
 
 from ai import AI
-from hex import HexPixelAdapter, HexMap, HexCoord, HexCell
+from book import OpeningBook
+from hex import HexPixelAdapter, HexMap, HexCoord, CHECK, CHECKMATE, STALEMATE
 from pixel import PixelCoord
+from render import BoardRenderer
+from tablebase import TablebaseSet
+from transposition import TranspositionTable
+from worker import SearchWorker
 
 pygame.init()
 
@@ -21,6 +27,12 @@ HEX_RADIUS: float = 30  # The radius of an individual hex on the screen, in pixe
 HEX_COLORS: list[tuple] = [(209, 139, 70), (252, 210, 164), (230, 171, 111)]  # A list of the three board colours.
 ADAPTER: HexPixelAdapter = HexPixelAdapter(GAME_DIMENSIONS, GAME_ORIGIN, HEX_RADIUS)  # The HexPixelAdapter for the map.
 PIECE_OFFSET: PixelCoord = PixelCoord(HEX_RADIUS, HEX_RADIUS) / 2  # The offset so pieces are centered when drawn.
+AI_TIME_LIMIT: float = 3  # How long the AI may think for each move, in seconds.
+AI_MAX_DEPTH: int = 8  # The deepest the AI will search, in plies, if it has time left.
+AI_BOOK_PATH: str = "book.bin"  # The opening book the AI plays from, if the file exists.
+AI_TABLEBASE_PATH: str = "tablebases"  # The endgame tablebases the AI plays from, if the directory exists.
+AI_CACHE_PATH: Optional[str] = None  # A file to keep the AI's transposition table in between games, e.g. "cache.bin".
+AI_WORKER: SearchWorker = SearchWorker(AI_TIME_LIMIT, AI_MAX_DEPTH)  # Runs the AI in the background, and ponders.
 
 # Generate every combination of piece names.
 piece_names: list[str] = [f"{color}_{name}" for color in "wb" for name in ("pawn", "rook", "knight", "bishop", "king", "queen")]
@@ -34,22 +46,26 @@ piece_imgs = {
     for piece_name in piece_names
 }
 
+if os.path.exists(AI_BOOK_PATH):
+    AI.book = OpeningBook(AI_BOOK_PATH)
+if os.path.isdir(AI_TABLEBASE_PATH):
+    AI.tablebases = TablebaseSet.load_directory(AI_TABLEBASE_PATH)
+AI.cache = TranspositionTable(megabytes=64, path=AI_CACHE_PATH)
 
-def draw_hex(coord: HexCoord, color: tuple, fill=False):
-    """Draws a hex to the screen."""
-    pygame.draw.polygon(SCREEN, color, ADAPTER.get_vertices(coord), 0 if fill else 3)
+RENDERER: BoardRenderer = BoardRenderer(SCREEN, HEX_MAP, ADAPTER, piece_imgs, HEX_COLORS, SIDE_FONT, GAME_WIDTH)
+CLOCK = pygame.time.Clock()  # Caps the frame rate while anything is moving.
+FPS: int = 60  # The most frames drawn per second.
 
 
-def draw_piece(cell: HexCell):
-    """Draws a piece to the screen."""
-    if cell.state is not None:
-        # Don't draw the piece if it's in a user move, or an AI move.
-        if cell.coord == start_hex:
-            return
-        elif is_ai_sprite_moving and cell.coord == ai_end_hex:
-            return
-        pixel_coords: PixelCoord = ADAPTER.hex_to_pixel(cell.coord)
-        SCREEN.blit(piece_imgs[cell.state], pixel_coords - PIECE_OFFSET)
+def update_king_state():
+    """Update the status string with whether the side to move is in check, checkmated or stalemated."""
+    global king_state_str
+    color: str = "b" if HEX_MAP.ply % 2 else "w"
+    king_state_str = {
+        CHECK: f"{'Black' if color == 'b' else 'White'} King Checked!",
+        CHECKMATE: "Black King Checkmated! White Wins" if color == "b" else "White King Checkmated! Black Wins",
+        STALEMATE: "Stalemate! It's a Draw",
+    }.get(HEX_MAP.game_status(color), "")
 
 
 def update_whose_turn():
@@ -60,11 +76,6 @@ def update_whose_turn():
     whose_turn_str = "Your (White's) Turn!" if is_even_ply else "Black is Thinking ..."
 
 
-def write_text(text: str, coordinates: tuple[int, int, int]):
-    """A wrapper method for writing text onto the screen."""
-    SCREEN.blit(SIDE_FONT.render(text, True, (0, 0, 0)), coordinates)
-
-
 start_hex: Optional[HexCoord] = None  # When a move is in progress, this stores the starting coord.
 piece_held: Optional[HexCoord] = None  # This stores the state of the piece held.
 valid_moves: Optional[list[HexCoord]] = None  # This stores the valid moves of the piece held.
@@ -79,13 +90,16 @@ ai_curr_pixel: Optional[PixelCoord] = None  # The `PixelCoord` of the sprites cu
 ai_end_pixel: Optional[PixelCoord] = None  # The `PixelCoord` of the end of the AI's move, also the sprites end point.
 ai_sprite_state: Optional[str] = None  # The state of the piece that the AI moved.
 
-ai_needs_turn: bool = False
-
 update_whose_turn()
 
 while True:
     for event in pygame.event.get():
+        if event.type == pygame.VIDEOEXPOSE:
+            RENDERER.invalidate()
+
         if event.type == pygame.QUIT:
+            AI_WORKER.cancel()
+            AI.cache.close()
             pygame.quit()
             exit()
 
@@ -94,8 +108,8 @@ while True:
             clicked_pixel: PixelCoord = PixelCoord(*pygame.mouse.get_pos())
             clicked_hex: HexCoord = round(ADAPTER.pixel_to_hex(clicked_pixel))
 
-            # An out of bounds check.
-            if clicked_hex not in HEX_MAP:
+            # An out of bounds check. The board is also left alone while Black is thinking.
+            if clicked_hex not in HEX_MAP or AI_WORKER.thinking:
                 continue
 
             # Get the state of where we clicked.
@@ -123,62 +137,36 @@ while True:
                 if clicked_hex in valid_moves:
                     HEX_MAP.make_move(start_hex, clicked_hex)
                     piece_held = start_hex = None
-                    if HEX_MAP.ply % 2:
-                        ai_needs_turn = True
-                        # update_whose_turn()
-                        # break
-
-                    # Update the king check / checkmate status string.
-                    if HEX_MAP.is_king_checked('w'):
-                        if HEX_MAP.is_king_checkmated('w'):
-                            king_state_str = "White King Checkmated! Black Wins"
-                        else:
-                            king_state_str = "White King Checked!"
-                    elif HEX_MAP.is_king_checked('b'):
-                        if HEX_MAP.is_king_checkmated('b'):
-                            king_state_str = "Black King Checkmated White Wins"
-                        else:
-                            king_state_str = "Black King Checked!"
-                    else:
-                        king_state_str = ""
+                    update_king_state()
                     update_whose_turn()
 
-    SCREEN.fill((255, 255, 255))
-    pygame.draw.line(SCREEN, (100, 100, 100), (GAME_WIDTH, 0), (GAME_WIDTH, GAME_HEIGHT))
-
-    write_text(whose_turn_str, (GAME_WIDTH, 25))
-    write_text(king_state_str, (GAME_WIDTH, 50))
-
-    # Draw the light brown, brown and dark brown hexagons first.
-    for cell in HEX_MAP:
-        color: tuple[int, int, int] = HEX_COLORS[(cell.coord.q - cell.coord.r) % 3]
-        draw_hex(cell.coord, color, fill=True)
+                    # Let the AI think in the background, unless the game is over.
+                    if HEX_MAP.ply % 2 and HEX_MAP.has_any_legal_move("b"):
+                        AI_WORKER.start(HEX_MAP)
 
-    # Draw the valid moves for the current piece. Green = move, red = capture, blue = starting hex.
+    # Colour the valid moves for the current piece. Green = move, red = capture, blue = starting hex.
+    highlights: dict[int, tuple] = {}
     if start_hex is not None:
         for coord in valid_moves:
-            color: tuple[int, int, int] = (255, 50, 50) if HEX_MAP[coord] else (50, 255, 50)
-            draw_hex(coord, color, fill=True)
-
-        draw_hex(start_hex, (50, 50, 255), fill=True)
+            highlights[HEX_MAP.index_of(coord)] = (255, 50, 50) if HEX_MAP[coord] else (50, 255, 50)
+        highlights[HEX_MAP.index_of(start_hex)] = (50, 50, 255)
 
     # Color the cell that the AI just moved from, red.
     # Makes it easier to see what move the AI made.
     if ai_start_hex is not None:
-        draw_hex(ai_start_hex, (200, 100, 100), fill=True)
+        highlights[HEX_MAP.index_of(ai_start_hex)] = (200, 100, 100)
 
-    # Draw the pieces, and then the black wireframe.
-    for cell in HEX_MAP:
-        draw_piece(cell)
-        draw_hex(cell.coord, (0, 0, 0))
+    # Don't draw the piece if it's in a user move, or an AI move. It's drawn as a sprite instead.
+    hidden: set[int] = set()
+    sprites: list[tuple] = []
 
     # If we're holding a piece, hover it under our mouse.
     if piece_held:
-        SCREEN.blit(piece_imgs[piece_held], pygame.mouse.get_pos())
+        hidden.add(HEX_MAP.index_of(start_hex))
+        sprites.append((piece_imgs[piece_held], pygame.mouse.get_pos()))
 
     # If the AI sprite is moving across the screen
     if is_ai_sprite_moving:
-        SCREEN.blit(piece_imgs[ai_sprite_state], ai_curr_pixel)
         offset = ai_end_pixel - ai_curr_pixel
 
         # Move the piece's position a fifth closer to the end.
@@ -190,13 +178,30 @@ while True:
         if offset.mag() < 1:
             is_ai_sprite_moving = False
 
-    pygame.display.flip()
-
-    if ai_needs_turn:
-        ai_start_hex, ai_end_hex = AI.move(HEX_MAP)
+    # Checked again, so that the frame after the sprite lands shows the piece back on the board.
+    if is_ai_sprite_moving:
+        hidden.add(HEX_MAP.index_of(ai_end_hex))
+        sprites.append((piece_imgs[ai_sprite_state], tuple(ai_curr_pixel)))
+
+    # Only the parts of the screen that changed are redrawn and sent to the display.
+    pygame.display.update(RENDERER.draw(highlights, hidden, sprites, [whose_turn_str, king_state_str]))
+    CLOCK.tick(FPS)
+
+    # Check whether the AI has finished thinking, without waiting for it.
+    ai_move: Optional[tuple[HexCoord, HexCoord]] = AI_WORKER.poll(HEX_MAP)
+    if ai_move is not None:
+        ai_start_hex, ai_end_hex = ai_move
+        HEX_MAP.make_move(ai_start_hex, ai_end_hex)
+        update_king_state()
         update_whose_turn()
         is_ai_sprite_moving = True
         ai_curr_pixel = ADAPTER.hex_to_pixel(ai_start_hex) - PIECE_OFFSET
         ai_end_pixel = ADAPTER.hex_to_pixel(ai_end_hex) - PIECE_OFFSET
         ai_sprite_state = HEX_MAP[ai_end_hex]
-        ai_needs_turn = False
+
+        # Think about Black's next move while White thinks about theirs.
+        AI_WORKER.ponder(HEX_MAP)
+
+    # With nothing moving and the AI not thinking, sleep until the next input rather than drawing the same frame.
+    if not (is_ai_sprite_moving or AI_WORKER.thinking):
+        pygame.event.post(pygame.event.wait())
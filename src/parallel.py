@@ -0,0 +1,124 @@
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Optional
+
+from ai import AI, SearchTimeout
+from hex import HexMap, HexCoord
+
+# The best root score found so far in the current search, shared by every worker process.
+shared_alpha = None
+
+
+def init_worker(alpha):
+    """Runs once in each worker process, to give it the shared alpha bound."""
+    global shared_alpha
+    shared_alpha = alpha
+
+
+def search_root_move(position: bytes, move: tuple[int, int], depth: int,
+                     time_left: Optional[float], node_limit: Optional[int]) -> Optional[float]:
+    """
+    Searches one root move in a worker process, returning its score for the side to move, or None if it ran out of
+    budget.
+    The position comes as `HexMap.to_bytes`, rather than a pickled `HexMap`.
+    """
+    hex_map: HexMap = HexMap.from_bytes(position)
+
+    # Start from the best score any worker has found so far. The window is opened by one below it, so that a move which
+    # ties with the best still gets its exact score, and ties are broken by move order just like the serial search.
+    alpha: float = shared_alpha.value - 1
+
+    AI.deadline = None if time_left is None else time.perf_counter() + time_left
+    AI.node_limit = node_limit
+    AI.nodes = 0
+
+    black_to_move: bool = hex_map.ply % 2 == 1
+    hex_map.push(move)
+    try:
+        if black_to_move:
+            score: float = AI.minimax(hex_map, depth - 1, alpha, math.inf, False)
+        else:
+            score = -AI.minimax(hex_map, depth - 1, -math.inf, -alpha, True)
+    except SearchTimeout:
+        return None
+    finally:
+        AI.deadline = AI.node_limit = None
+
+    with shared_alpha.get_lock():
+        if score > shared_alpha.value:
+            shared_alpha.value = score
+
+    return score
+
+
+class ParallelSearch:
+    """
+    Searches the root moves across a pool of worker processes.
+    Workers share the best score found so far as their alpha bound, and pick the same move as `AI.search_root` at the
+    same depth. Use it with `AI.move(..., parallel=...)`, and close it (or use it as a context manager) when done.
+    """
+
+    def __init__(self, workers: Optional[int] = None):
+        self.workers: int = workers or os.cpu_count() or 1
+        self.alpha = multiprocessing.Value("d", -math.inf)
+        self.executor: ProcessPoolExecutor = ProcessPoolExecutor(
+            self.workers, initializer=init_worker, initargs=(self.alpha,)
+        )
+
+    def __enter__(self) -> "ParallelSearch":
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def close(self):
+        """Shut down the worker processes."""
+        self.executor.shutdown(cancel_futures=True)
+
+    def search_root(self, hex_map: HexMap, depth: int, moves: list[tuple[int, int]], deadline: Optional[float] = None,
+                    node_limit: Optional[int] = None) -> tuple[float, tuple[int, int]]:
+        """
+        Searches each of the side to move's moves to a total depth in plies, returning the best score and move.
+        Raises `SearchTimeout` if any move couldn't be searched within the budget.
+        """
+        self.alpha.value = -math.inf
+        position: bytes = hex_map.to_bytes()
+        time_left: Optional[float] = None if deadline is None else max(0.0, deadline - time.perf_counter())
+
+        futures: list[Future] = [
+            self.executor.submit(search_root_move, position, move, depth, time_left, node_limit) for move in moves
+        ]
+        scores: list[Optional[float]] = [future.result() for future in futures]
+
+        if None in scores:
+            raise SearchTimeout
+
+        # The first of the best moves, as the serial search would choose.
+        best: int = max(range(len(moves)), key=lambda i: (scores[i], -i))
+        return scores[best], moves[best]
+
+
+def benchmark(depth: int = 3, worker_counts: tuple[int, ...] = (1, 2, 4, 8)) -> list[tuple[int, float, float]]:
+    """
+    Times a fixed-depth root search from an opening position with different numbers of workers.
+    Returns (workers, seconds, speedup over one worker) for each.
+    """
+    hex_map: HexMap = HexMap.from_glinski()
+    hex_map.push((HexCoord(0, -1, 1), HexCoord(0, 0, 0)))
+    moves: list[tuple[int, int]] = hex_map.legal_moves("b")
+
+    results: list[tuple[int, float, float]] = []
+    for workers in worker_counts:
+        with ParallelSearch(workers) as search:
+            # Start every worker process before the clock does.
+            search.search_root(hex_map, 1, moves)
+
+            start_time: float = time.perf_counter()
+            search.search_root(hex_map, depth, moves)
+            seconds: float = time.perf_counter() - start_time
+
+        results.append((workers, seconds, results[0][1] / seconds if results else 1.0))
+    return results
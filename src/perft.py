@@ -0,0 +1,91 @@
+import argparse
+import time
+from array import array
+
+from hex import HexMap
+
+# Positions to check the move generator against, as (board string, ply), along with their known leaf node counts from
+# depth 1 upwards.
+test_positions: dict[str, tuple[str, int, list[int]]] = {
+    "start": (str(HexMap.from_glinski()), 0, [43, 1846, 84240]),
+    "middlegame": (
+        "xxxxxxpxxxxxPrpxxxxPxnxpxxPxxxxxBxpbxRxQbxbxpxPRBxxkxrpxxPxNKnxpxxxPxNxxpBxPxxpxxxxxPxxxqxx",
+        24, [62, 3932, 245609]
+    ),
+    "check": (
+        "xxxxxxpxxxxxPxxpxxxPxnxxpxxPRxxnxpxxbQxxbxxrpxPxxxBxxxpxPxxNKbkxpxPxxxrpxxxxPRpxxxxxPxBBxxx",
+        29, [9, 318, 16976]
+    ),
+    "endgame": (
+        "xxxxxxxxxxxxxrxxxxxxxxxxxxxNxxxxxpxxxxxxxxxxpxPxxxxkxxxxxxxxKxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx",
+        0, [29, 494, 13541]
+    ),
+}
+
+
+def perft(hex_map: HexMap, depth: int) -> int:
+    """Count the leaf nodes of the legal move tree to a depth, for the side whose turn it is."""
+    if depth == 0:
+        return 1
+
+    # The moves at the last ply don't need to be made, only counted.
+    moves: array = hex_map.legal_move_codes("b" if hex_map.ply % 2 else "w")
+    if depth == 1:
+        return len(moves)
+
+    nodes: int = 0
+    for move in moves:
+        hex_map.push_move(move)
+        nodes += perft(hex_map, depth - 1)
+        hex_map.pop()
+    return nodes
+
+
+def divide(hex_map: HexMap, depth: int) -> dict[str, int]:
+    """Split the perft count to a depth by root move, to help find which move a generator gets wrong."""
+    counts: dict[str, int] = {}
+    for move in hex_map.legal_moves("b" if hex_map.ply % 2 else "w"):
+        hex_map.push(move)
+        counts[hex_map.move_name(move)] = perft(hex_map, depth - 1)
+        hex_map.pop()
+    return counts
+
+
+def load_position(name: str) -> HexMap:
+    """Get one of the stored test positions as a `HexMap`."""
+    board_str, ply, _ = test_positions[name]
+    return HexMap.from_str(board_str, ply)
+
+
+def benchmark(depth: int) -> tuple[int, float]:
+    """Run perft on every stored position to a depth, checking the known counts. Returns (nodes, seconds)."""
+    total_nodes: int = 0
+    start_time: float = time.perf_counter()
+
+    for name, (_, _, counts) in test_positions.items():
+        nodes: int = perft(load_position(name), depth)
+        if depth <= len(counts) and nodes != counts[depth - 1]:
+            raise AssertionError(f"perft({depth}) of {name} gave {nodes} nodes, expected {counts[depth - 1]}")
+        total_nodes += nodes
+
+    return total_nodes, time.perf_counter() - start_time
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Count the leaf nodes of the move tree, to test the move generator.")
+    parser.add_argument("depth", type=int, help="depth in plies")
+    parser.add_argument("--position", default="start", choices=test_positions, help="stored position to start from")
+    parser.add_argument("--divide", action="store_true", help="split the count by root move")
+    parser.add_argument("--bench", action="store_true", help="time every stored position and report nodes/sec")
+    args = parser.parse_args()
+
+    if args.bench:
+        bench_nodes, seconds = benchmark(args.depth)
+        print(f"{bench_nodes} nodes in {seconds:.2f}s: {bench_nodes / seconds:.0f} nodes/sec")
+    elif args.divide:
+        divide_counts: dict[str, int] = divide(load_position(args.position), args.depth)
+        for move_name, count in divide_counts.items():
+            print(f"{move_name}: {count}")
+        print(f"\n{sum(divide_counts.values())} nodes")
+    else:
+        print(f"{perft(load_position(args.position), args.depth)} nodes")
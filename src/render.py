@@ -0,0 +1,135 @@
+from typing import Optional
+
+import pygame
+
+from hex import HexPixelAdapter, HexMap, piece_names
+
+
+class BoardRenderer:
+    """
+    Draws the game to the screen, only redrawing the parts that changed since the last frame.
+    The static board (the coloured hexagons, their outlines and the side text) is drawn once to a background surface,
+    and every hexagon's vertices and bounding rect are worked out up front. Each frame, the cells whose piece or
+    highlight changed, and the areas the sprites moved over, are restored from the background and drawn over again,
+    and only those rects are sent to the display.
+    """
+
+    OUTLINE_COLOR: tuple[int, int, int] = (0, 0, 0)
+    OUTLINE_WIDTH: int = 3
+
+    def __init__(self, screen: pygame.Surface, hex_map: HexMap, adapter: HexPixelAdapter, piece_imgs: dict,
+                 hex_colors: list[tuple], side_font: pygame.font.Font, game_width: int):
+        self.screen: pygame.Surface = screen
+        self.hex_map: HexMap = hex_map
+        self.piece_imgs: dict = piece_imgs
+        self.side_font: pygame.font.Font = side_font
+        self.game_width: int = game_width
+
+        # The vertices, base colour, piece position and bounding rect of each cell, by cell index.
+        self.vertices: list[list[tuple[float, float]]] = [
+            [tuple(vertex) for vertex in adapter.get_vertices(coord)] for coord in hex_map.coords
+        ]
+        self.colors: list[tuple] = [hex_colors[(coord.q - coord.r) % 3] for coord in hex_map.coords]
+        self.piece_positions: list[tuple[float, float]] = []
+        self.rects: list[pygame.Rect] = []
+        for coord, vertices in zip(hex_map.coords, self.vertices):
+            xs, ys = [x for x, _ in vertices], [y for _, y in vertices]
+            rect = pygame.Rect(int(min(xs)), int(min(ys)), int(max(xs) - min(xs)) + 1, int(max(ys) - min(ys)) + 1)
+            self.rects.append(rect.inflate(self.OUTLINE_WIDTH * 2, self.OUTLINE_WIDTH * 2))
+
+            x, y = adapter.hex_to_pixel(coord)
+            self.piece_positions.append((x - adapter.hex_radius / 2, y - adapter.hex_radius / 2))
+
+        self.side_rect: pygame.Rect = pygame.Rect(game_width + 1, 0, screen.get_width() - game_width - 1,
+                                                  screen.get_height())
+        self.background: pygame.Surface = pygame.Surface(screen.get_size())
+        self.text: list[str] = []
+        self.draw_background()
+
+        # What was drawn last frame, to compare against: each cell's (piece code, highlight, hidden), and sprite rects.
+        self.cells: list[Optional[tuple]] = [None] * len(hex_map.coords)
+        self.sprite_rects: list[pygame.Rect] = []
+        self.full_redraw: bool = True
+
+    def draw_background(self):
+        """Draw the parts of the screen that don't change from frame to frame."""
+        self.background.fill((255, 255, 255))
+        pygame.draw.line(self.background, (100, 100, 100), (self.game_width, 0),
+                         (self.game_width, self.background.get_height()))
+
+        for vertices, color in zip(self.vertices, self.colors):
+            pygame.draw.polygon(self.background, color, vertices)
+        for vertices in self.vertices:
+            pygame.draw.polygon(self.background, self.OUTLINE_COLOR, vertices, self.OUTLINE_WIDTH)
+
+        self.draw_text()
+
+    def draw_text(self):
+        """Write the lines of side text onto the background."""
+        self.background.fill((255, 255, 255), self.side_rect)
+        for i, line in enumerate(self.text):
+            self.background.blit(self.side_font.render(line, True, (0, 0, 0)), (self.game_width, 25 * (i + 1)))
+
+    def invalidate(self):
+        """Redraw the whole screen next frame, such as after the window was covered."""
+        self.full_redraw = True
+
+    def draw(self, highlights: dict[int, tuple], hidden: set[int], sprites: list[tuple[pygame.Surface, tuple]],
+             text: list[str]) -> list[pygame.Rect]:
+        """
+        Draw a frame, and return the rects of the screen that changed, ready for `pygame.display.update`.
+        `highlights` colours cells in place of their usual colour, the pieces on `hidden` cells aren't drawn, and each
+        sprite is an image drawn on top of everything at a pixel position.
+        """
+        dirty: list[pygame.Rect] = []
+
+        if text != self.text:
+            self.text = list(text)
+            self.draw_text()
+            dirty.append(self.side_rect)
+
+        board: bytearray = self.hex_map.board
+        for cell, rect in enumerate(self.rects):
+            state: tuple = (board[cell], highlights.get(cell), cell in hidden)
+            if state != self.cells[cell]:
+                self.cells[cell] = state
+                dirty.append(rect)
+
+        # Sprites have to be erased from where they were, and drawn where they are now.
+        sprite_rects: list[pygame.Rect] = [image.get_rect(topleft=position) for image, position in sprites]
+        if sprite_rects != self.sprite_rects:
+            dirty += self.sprite_rects + sprite_rects
+            self.sprite_rects = sprite_rects
+
+        if self.full_redraw:
+            self.full_redraw = False
+            dirty = [self.screen.get_rect()]
+
+        for rect in dirty:
+            self.draw_area(rect, highlights, hidden, sprites)
+        self.screen.set_clip(None)
+
+        return dirty
+
+    def draw_area(self, area: pygame.Rect, highlights: dict[int, tuple], hidden: set[int],
+                  sprites: list[tuple[pygame.Surface, tuple]]):
+        """Redraw one rect of the screen from the background up."""
+        self.screen.set_clip(area)
+        self.screen.blit(self.background, area, area)
+
+        # Only the cells that overlap the area need drawing again: their highlights, then outlines, then pieces.
+        cells: list[int] = area.collidelistall(self.rects)
+        highlighted: list[int] = [cell for cell in cells if cell in highlights]
+        for cell in highlighted:
+            pygame.draw.polygon(self.screen, highlights[cell], self.vertices[cell])
+        if highlighted:
+            for cell in cells:
+                pygame.draw.polygon(self.screen, self.OUTLINE_COLOR, self.vertices[cell], self.OUTLINE_WIDTH)
+
+        for cell in cells:
+            name: Optional[str] = piece_names[self.hex_map.board[cell]]
+            if name is not None and cell not in hidden:
+                self.screen.blit(self.piece_imgs[name], self.piece_positions[cell])
+
+        for image, position in sprites:
+            self.screen.blit(image, position)
@@ -0,0 +1,198 @@
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Optional
+
+from ai import AI
+from book import OpeningBook
+from hex import HexMap, CHECKMATE, STALEMATE
+from transposition import TranspositionTable
+
+# Game results, from White's point of view, as they are written in game records.
+WHITE_WIN, BLACK_WIN, DRAW = "1-0", "0-1", "1/2-1/2"
+
+
+class EngineConfig:
+    """How one side of a match searches: its depth in plies, and optionally a time limit in seconds or a node limit."""
+
+    def __init__(self, depth: int = 3, time_limit: Optional[float] = None, node_limit: Optional[int] = None):
+        self.depth: int = depth
+        self.time_limit: Optional[float] = time_limit
+        self.node_limit: Optional[int] = node_limit
+
+    def __str__(self) -> str:
+        limits: list[str] = [f"depth {self.depth}"]
+        if self.time_limit is not None:
+            limits.append(f"{self.time_limit}s")
+        if self.node_limit is not None:
+            limits.append(f"{self.node_limit} nodes")
+        return ", ".join(limits)
+
+
+def load_files(book: Optional[str], cache: Optional[str] = None):
+    """
+    Runs once in each worker process, to open the opening book and the transposition table file. Every process maps
+    the same files, so the workers share what they learn.
+    """
+    if book is not None:
+        AI.book = OpeningBook(book)
+    if cache is not None:
+        AI.cache = TranspositionTable(path=cache)
+
+
+def play_game(game: int, white: EngineConfig, black: EngineConfig, opening_seed: int, random_plies: int = 0,
+              max_plies: int = 300) -> dict:
+    """
+    Play one game between two engine configurations, and return its record.
+    The game starts with some random moves, the same for the same seed, and is drawn once it reaches `max_plies`.
+    """
+    start_time: float = time.perf_counter()
+    hex_map: HexMap = HexMap.from_glinski()
+
+    # Unless they were asked to share a table file, each side searches with its own transposition table and history,
+    # fresh for the game, so neither side learns from the other's searches or from the previous game.
+    shared_cache: TranspositionTable = AI.cache
+    shared_history: array = AI.history
+    caches: dict[str, TranspositionTable] = {}
+    histories: dict[str, array] = {}
+    if shared_cache.path is None:
+        caches = {color: TranspositionTable(entries=len(shared_cache)) for color in "wb"}
+        histories = {color: array("I", [0]) * len(shared_history) for color in "wb"}
+
+    rng: random.Random = random.Random(opening_seed)
+    opening: list[str] = []
+    moves: list[str] = []
+    result, reason = DRAW, "move limit"
+
+    while hex_map.ply < max_plies:
+        color: str = "b" if hex_map.ply % 2 else "w"
+        status: str = hex_map.game_status(color)
+
+        if status == CHECKMATE:
+            result, reason = (WHITE_WIN if color == "b" else BLACK_WIN), status
+            break
+        elif status == STALEMATE:
+            result, reason = DRAW, status
+            break
+
+        if len(opening) < random_plies:
+            move: tuple[int, int] = rng.choice(hex_map.legal_moves(color))
+            opening.append(hex_map.move_name(move))
+            hex_map.push(move)
+            continue
+
+        config: EngineConfig = black if color == "b" else white
+        AI.cache = caches.get(color, shared_cache)
+        AI.history = histories.get(color, shared_history)
+        AI.killers.clear()
+        try:
+            start, end = AI.move(hex_map, time_limit=config.time_limit, max_depth=config.depth,
+                                 node_limit=config.node_limit)
+        finally:
+            AI.cache, AI.history = shared_cache, shared_history
+        moves.append(hex_map.move_name((start, end)))
+
+    return {
+        "game": game,
+        "opening": opening,
+        "moves": moves,
+        "result": result,
+        "reason": reason,
+        "plies": hex_map.ply,
+        "seconds": time.perf_counter() - start_time,
+    }
+
+
+def match_score(scores: list[float]) -> tuple[float, float]:
+    """The mean of a list of game scores (1 for a win, 0.5 for a draw, 0 for a loss), and the 95% margin of error."""
+    if not scores:
+        return 0.0, 0.0
+    mean: float = sum(scores) / len(scores)
+    if len(scores) < 2:
+        return mean, 0.0
+    variance: float = sum((score - mean) ** 2 for score in scores) / (len(scores) - 1)
+    return mean, 1.96 * math.sqrt(variance / len(scores))
+
+
+def elo_difference(score: float) -> float:
+    """The rating difference that a mean score corresponds to."""
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / score - 1) + 0.0  # Adding 0.0 turns -0.0 into 0.0.
+
+
+def run_match(games: int, engine_a: EngineConfig, engine_b: EngineConfig, workers: Optional[int] = None,
+              random_plies: int = 0, max_plies: int = 300, seed: int = 0, output: Optional[str] = None,
+              book: Optional[str] = None, cache: Optional[str] = None) -> list[float]:
+    """
+    Play games between two engine configurations in worker processes, and return engine A's score in each game.
+    Games come in pairs with the same opening, each engine taking White once. Each game record is written as a line of
+    JSON to the output file as soon as the game finishes, with progress on stderr. Both engines play from the opening
+    book file, and share the transposition table file, if they are given.
+    """
+    scores: list[float] = []
+    file = None if output is None else open(output, "a")
+
+    with ProcessPoolExecutor(workers or os.cpu_count() or 1, initializer=load_files,
+                             initargs=(book, cache)) as executor:
+        futures: dict = {}
+        for game in range(games):
+            a_is_white: bool = game % 2 == 0
+            white, black = (engine_a, engine_b) if a_is_white else (engine_b, engine_a)
+            future = executor.submit(play_game, game, white, black, seed + game // 2, random_plies, max_plies)
+            futures[future] = a_is_white
+
+        for future in as_completed(futures):
+            record: dict = future.result()
+            a_is_white = futures[future]
+            record["white"], record["black"] = ("A", "B") if a_is_white else ("B", "A")
+
+            white_score: float = {WHITE_WIN: 1.0, BLACK_WIN: 0.0, DRAW: 0.5}[record["result"]]
+            scores.append(white_score if a_is_white else 1 - white_score)
+
+            if file is not None:
+                file.write(json.dumps(record) + "\n")
+                file.flush()
+
+            mean, margin = match_score(scores)
+            print(f"game {record['game']}: {record['result']} by {record['reason']} in {record['plies']} plies, "
+                  f"A scores {mean:.3f} +/- {margin:.3f} after {len(scores)} games", file=sys.stderr)
+
+    if file is not None:
+        file.close()
+    return scores
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play engine-against-engine games without a display.")
+    parser.add_argument("--games", type=int, default=100, help="number of games to play")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes, one per CPU by default")
+    for engine in "ab":
+        parser.add_argument(f"--{engine}-depth", type=int, default=3, help=f"engine {engine.upper()}'s search depth")
+        parser.add_argument(f"--{engine}-time", type=float, default=None,
+                            help=f"engine {engine.upper()}'s time limit per move, in seconds")
+        parser.add_argument(f"--{engine}-nodes", type=int, default=None,
+                            help=f"engine {engine.upper()}'s node limit per move")
+    parser.add_argument("--random-plies", type=int, default=4, help="random moves to start each pair of games with")
+    parser.add_argument("--max-plies", type=int, default=300, help="plies after which a game is drawn")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the random openings")
+    parser.add_argument("--output", default=None, help="file to append game records to, as lines of JSON")
+    parser.add_argument("--book", default=None, help="opening book file for both engines to play from")
+    parser.add_argument("--cache", default=None, help="transposition table file for both engines to share and keep")
+    args = parser.parse_args()
+
+    config_a: EngineConfig = EngineConfig(args.a_depth, args.a_time, args.a_nodes)
+    config_b: EngineConfig = EngineConfig(args.b_depth, args.b_time, args.b_nodes)
+    print(f"A: {config_a}\nB: {config_b}", file=sys.stderr)
+
+    match_scores: list[float] = run_match(args.games, config_a, config_b, args.workers, args.random_plies,
+                                          args.max_plies, args.seed, args.output, args.book, args.cache)
+    score_a, error = match_score(match_scores)
+    print(f"A scores {score_a:.3f} +/- {error:.3f} over {len(match_scores)} games "
+          f"(Elo {elo_difference(score_a):+.0f}, 95% range {elo_difference(score_a - error):+.0f} to "
+          f"{elo_difference(score_a + error):+.0f})")
@@ -0,0 +1,286 @@
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import statistics
+import sys
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Optional
+
+from ai import AI
+from hex import HexMap, CHECKMATE, STALEMATE
+
+# How many of the latest requests the latency figures cover.
+LATENCY_WINDOW: int = 1000
+
+
+def search_move(position: bytes, time_limit: float, max_depth: int) -> tuple[int, int, float]:
+    """
+    Searches a position in a worker process, returning the engine's (start, end) move and how long it took.
+    The position comes as `HexMap.to_bytes`, and each worker keeps its own transposition table warm between searches.
+    """
+    hex_map: HexMap = HexMap.from_bytes(position)
+    start_time: float = time.perf_counter()
+    start, end = AI.move(hex_map, time_limit=time_limit, max_depth=max_depth)
+    return hex_map.index_of(start), hex_map.index_of(end), time.perf_counter() - start_time
+
+
+class GameSession:
+    """
+    One game between a human and the engine. Each side has a clock holding what is left of its time budget, in
+    seconds: the human's runs from when it became their turn, and the engine's from its searches.
+    """
+
+    def __init__(self, game_id: int, human: str, clock: float):
+        self.id: int = game_id
+        self.hex_map: HexMap = HexMap.from_glinski()
+        self.human: str = human
+        self.engine: str = "b" if human == "w" else "w"
+        self.clocks: dict[str, float] = {"w": clock, "b": clock}
+        self.turn_started: float = time.perf_counter()
+        self.thinking: bool = False
+
+        # Set once the game is over: the result from White's point of view, and why.
+        self.result: Optional[str] = None
+        self.reason: Optional[str] = None
+
+    @property
+    def to_move(self) -> str:
+        return "b" if self.hex_map.ply % 2 else "w"
+
+    def check_clock(self):
+        """End the game if the human has run out of time on their move."""
+        if self.result is None and self.to_move == self.human and not self.thinking:
+            if time.perf_counter() - self.turn_started > self.clocks[self.human]:
+                self.finish("1-0" if self.human == "b" else "0-1", "time")
+
+    def check_end(self):
+        """End the game if the side to move is checkmated or stalemated, or the engine ran out of time."""
+        color: str = self.to_move
+        status: str = self.hex_map.game_status(color)
+        if self.clocks[self.engine] < 0:
+            self.finish("1-0" if self.engine == "b" else "0-1", "time")
+        elif status == CHECKMATE:
+            self.finish("1-0" if color == "b" else "0-1", status)
+        elif status == STALEMATE:
+            self.finish("1/2-1/2", status)
+
+    def finish(self, result: str, reason: str):
+        self.result, self.reason = result, reason
+
+    def state(self) -> dict:
+        """What the client is told about the game after every request."""
+        hex_map: HexMap = self.hex_map
+        legal_moves: list[str] = []
+        if self.result is None and self.to_move == self.human and not self.thinking:
+            legal_moves = [hex_map.move_name(move) for move in hex_map.legal_moves(self.human)]
+
+        return {
+            "game": self.id,
+            "board": str(hex_map),
+            "ply": hex_map.ply,
+            "to_move": self.to_move,
+            "legal_moves": legal_moves,
+            "clocks": {color: round(seconds, 3) for color, seconds in self.clocks.items()},
+            "result": self.result,
+            "reason": self.reason,
+        }
+
+
+class GameServer:
+    """
+    Hosts many games at once over a socket, one JSON object per line each way. Requests are:
+
+        {"op": "new", "color": "w"}                 start a game, with the human playing White (or "b")
+        {"op": "move", "game": 1, "move": "f5f6"}   play the human's move, answered once the engine has replied
+        {"op": "state", "game": 1}                  the game as it stands
+        {"op": "close", "game": 1}                  forget a game
+        {"op": "metrics"}                           how busy the server is
+
+    Every game answer includes the game's state, with the human's legal moves when it is their turn, and errors are
+    answered with {"error": ...}. Engine searches run in a pool of worker processes so the event loop never waits on
+    them. No more searches than there are workers are handed to the pool at once; the rest queue up on the server,
+    and once `max_queue` are waiting, new moves are turned away until the queue goes down.
+    """
+
+    def __init__(self, executor: Executor, workers: int, max_depth: int = 4, move_time: float = 1.0,
+                 clock: float = 300.0, max_queue: int = 64):
+        self.executor: Executor = executor
+        self.max_depth: int = max_depth
+        self.move_time: float = move_time
+        self.clock: float = clock
+        self.max_queue: int = max_queue
+
+        self.games: dict[int, GameSession] = {}
+        self.game_ids: itertools.count = itertools.count(1)
+        self.searches: asyncio.Semaphore = asyncio.Semaphore(workers)
+
+        # The figures reported by `metrics`.
+        self.queued: int = 0
+        self.running: int = 0
+        self.requests: int = 0
+        self.latencies: deque = deque(maxlen=LATENCY_WINDOW)
+        self.queue_waits: deque = deque(maxlen=LATENCY_WINDOW)
+        self.search_times: deque = deque(maxlen=LATENCY_WINDOW)
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Answer one client's requests, in order, until it disconnects."""
+        try:
+            while line := await reader.readline():
+                start_time: float = time.perf_counter()
+                try:
+                    answer: dict = await self.handle(json.loads(line))
+                except (ValueError, KeyError, TypeError) as error:
+                    answer = {"error": str(error)}
+
+                writer.write(json.dumps(answer).encode() + b"\n")
+                await writer.drain()
+                self.requests += 1
+                self.latencies.append(time.perf_counter() - start_time)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def handle(self, request: dict) -> dict:
+        op: str = request["op"]
+        if op == "metrics":
+            return self.metrics()
+        if op == "new":
+            return await self.new_game(request.get("color", "w"))
+
+        session: Optional[GameSession] = self.games.get(request["game"])
+        if session is None:
+            raise ValueError(f"No game {request['game']}")
+
+        if op == "move":
+            return await self.move(session, request["move"])
+        elif op == "state":
+            session.check_clock()
+            return session.state()
+        elif op == "close":
+            del self.games[session.id]
+            return {"game": session.id, "closed": True}
+        raise ValueError(f"Unknown op {op!r}")
+
+    async def new_game(self, color: str) -> dict:
+        if color not in ("w", "b"):
+            raise ValueError(f"Not a colour: {color!r}")
+        session: GameSession = GameSession(next(self.game_ids), color, self.clock)
+        self.games[session.id] = session
+
+        if session.engine == "w":
+            await self.engine_move(session)
+        return session.state()
+
+    async def move(self, session: GameSession, name: str) -> dict:
+        """Play the human's move, then the engine's reply."""
+        session.check_clock()
+        if session.result is not None:
+            raise ValueError(f"Game {session.id} is over")
+        if session.to_move != session.human or session.thinking:
+            raise ValueError(f"It isn't your move in game {session.id}")
+
+        move: tuple[int, int] = session.hex_map.parse_move(name)
+        if move not in session.hex_map.legal_moves(session.human):
+            raise ValueError(f"Illegal move {name}")
+        if self.queued >= self.max_queue:
+            raise ValueError("The server is busy, try again later")
+
+        session.clocks[session.human] -= time.perf_counter() - session.turn_started
+        session.hex_map.push(move)
+        session.check_end()
+
+        if session.result is None:
+            await self.engine_move(session)
+        return session.state()
+
+    async def engine_move(self, session: GameSession):
+        """Search the engine's move in the worker pool, and play it."""
+        # Spend a share of what is left on the engine's clock, so a game can't take more than its budget.
+        time_limit: float = max(0.0, min(self.move_time, session.clocks[session.engine] / 20))
+        position: bytes = session.hex_map.to_bytes()
+
+        session.thinking = True
+        self.queued += 1
+        queued_time: float = time.perf_counter()
+        try:
+            async with self.searches:
+                self.queued -= 1
+                self.running += 1
+                self.queue_waits.append(time.perf_counter() - queued_time)
+                try:
+                    start, end, seconds = await asyncio.get_running_loop().run_in_executor(
+                        self.executor, search_move, position, time_limit, self.max_depth)
+                finally:
+                    self.running -= 1
+        finally:
+            session.thinking = False
+
+        self.search_times.append(seconds)
+        session.clocks[session.engine] -= seconds
+        session.hex_map.push((start, end))
+        session.turn_started = time.perf_counter()
+        session.check_end()
+
+    def metrics(self) -> dict:
+        """How busy the server is, with latencies in milliseconds over the latest requests."""
+        def summary(seconds: deque) -> dict:
+            if not seconds:
+                return {"mean": 0.0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+            ordered: list[float] = sorted(seconds)
+            return {
+                "mean": round(statistics.fmean(ordered) * 1000, 3),
+                "p50": round(ordered[len(ordered) // 2] * 1000, 3),
+                "p95": round(ordered[int(len(ordered) * 0.95)] * 1000, 3),
+                "max": round(ordered[-1] * 1000, 3),
+            }
+
+        return {
+            "games": len(self.games),
+            "finished_games": sum(session.result is not None for session in self.games.values()),
+            "requests": self.requests,
+            "queue_depth": self.queued,
+            "running_searches": self.running,
+            "latency_ms": summary(self.latencies),
+            "queue_wait_ms": summary(self.queue_waits),
+            "search_ms": summary(self.search_times),
+        }
+
+
+async def serve(server: GameServer, host: str = "127.0.0.1", port: int = 8765, unix: Optional[str] = None):
+    """Serve games over TCP, or over a Unix socket if given its path, until cancelled."""
+    if unix is not None:
+        listener: asyncio.Server = await asyncio.start_unix_server(server.handle_client, unix)
+    else:
+        listener = await asyncio.start_server(server.handle_client, host, port)
+
+    address: str = unix if unix is not None else ", ".join(str(sock.getsockname()) for sock in listener.sockets)
+    print(f"Serving games on {address}", file=sys.stderr)
+    async with listener:
+        await listener.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Host many human-against-engine games over a socket.")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on")
+    parser.add_argument("--port", type=int, default=8765, help="TCP port to listen on")
+    parser.add_argument("--unix", default=None, help="listen on a Unix socket at this path instead")
+    parser.add_argument("--workers", type=int, default=None, help="search processes, one per CPU by default")
+    parser.add_argument("--depth", type=int, default=4, help="the engine's search depth")
+    parser.add_argument("--move-time", type=float, default=1.0, help="the most the engine thinks per move, in seconds")
+    parser.add_argument("--clock", type=float, default=300.0, help="each side's time budget per game, in seconds")
+    parser.add_argument("--max-queue", type=int, default=64, help="searches that may wait before moves are refused")
+    args = parser.parse_args()
+
+    worker_count: int = args.workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(worker_count) as pool:
+        game_server: GameServer = GameServer(pool, worker_count, args.depth, args.move_time, args.clock,
+                                             args.max_queue)
+        try:
+            asyncio.run(serve(game_server, args.host, args.port, args.unix))
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,411 @@
+import argparse
+import mmap
+import os
+import struct
+import sys
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from hex import HexMap, HexCoord, piece_codes, EMPTY, BLACK, KING, TYPE_MASK
+
+# Results, for the side to move. Positions that can't come up in a game, because two pieces share a cell or the side
+# that isn't to move is in check, are marked illegal.
+DRAW, WIN, LOSS, ILLEGAL = range(4)
+
+# Every tablebase file starts with this, then the radius of the board and the material, before the results.
+MAGIC: bytes = b"HEXTB001"
+HEADER: struct.Struct = struct.Struct("<8sB15s")
+
+# The letters used to write material, such as "KQvK", in the order each side's pieces are listed.
+piece_letters: dict[str, str] = {"K": "king", "Q": "queen", "R": "rook", "B": "bishop", "N": "knight"}
+letter_codes: dict[int, str] = {piece_codes[f"w_{name}"] & TYPE_MASK: letter for letter, name in piece_letters.items()}
+
+
+def parse_material(material: str) -> list[int]:
+    """
+    The piece codes of a material set written like "KQvK": White's pieces, then Black's, each side starting with the
+    king. Tablebases don't cover pawns, as they can promote and so leave the set.
+    """
+    sides: list[str] = material.split("v")
+    if len(sides) != 2 or any(not side.startswith("K") or "K" in side[1:] for side in sides):
+        raise ValueError(f"Not a material set: {material!r}")
+
+    codes: list[int] = []
+    for color, side in zip("wb", sides):
+        for letter in side:
+            if letter not in piece_letters:
+                raise ValueError(f"Tablebases don't cover {letter!r} pieces: {material!r}")
+            codes.append(piece_codes[f"{color}_{piece_letters[letter]}"])
+    return codes
+
+
+def material_of(codes: list[int]) -> str:
+    """Write a list of piece codes as a material set, like "KQvK"."""
+    sides: list[str] = []
+    for color_bit in (0, BLACK):
+        letters: list[str] = [letter_codes[code & TYPE_MASK] for code in codes if code & BLACK == color_bit]
+        sides.append("".join(sorted(letters, key="KQRBN".index)))
+    return "v".join(sides)
+
+
+def swap_sides(material: str) -> str:
+    """The same material set with the colours swapped."""
+    white, black = material.split("v")
+    return f"{black}v{white}"
+
+
+def submaterials(material: str) -> list[str]:
+    """
+    Every smaller material set that captures can lead to from a material set, other than two bare kings, each listed
+    after the ones it leads to in turn, so they can be generated in order. Sets that only differ by colour are listed
+    once.
+    """
+    codes: list[int] = parse_material(material)
+    found: list[str] = []
+    for i, code in enumerate(codes):
+        if code & TYPE_MASK != KING:
+            submaterial: str = material_of(codes[:i] + codes[i + 1:])
+            if submaterial == "KvK":
+                continue
+            for name in submaterials(submaterial) + [submaterial]:
+                if name not in found and swap_sides(name) not in found:
+                    found.append(name)
+    return found
+
+
+class Tablebase:
+    """
+    The result and distance to mate of every position with a set of pieces, for either side to move.
+    Positions are indexed by the cell of each piece, in the order of the material set, and then by the side to move:
+    index = black_to_move * cells ** pieces + sum(cell_i * cells ** (pieces - 1 - i)).
+    Results are packed four to a byte, and distances to mate (in plies) take a byte each.
+    """
+
+    def __init__(self, material: str, radius: int, results, distances):
+        self.material: str = material
+        self.codes: list[int] = parse_material(material)
+        self.radius: int = radius
+        self.cells: int = 3 * radius * (radius + 1) + 1
+        self.half: int = self.cells ** len(self.codes)
+        self.places: list[int] = [self.cells ** (len(self.codes) - 1 - i) for i in range(len(self.codes))]
+
+        self.results = results
+        self.distances = distances
+        self.mmap: Optional[mmap.mmap] = None
+
+        # The cell each cell maps to when the board is turned around so that the colours swap, for probing positions
+        # where the colours of the material set are the other way round.
+        hex_map: HexMap = HexMap.from_radius(radius)
+        self.mirror: list[int] = [hex_map.index_of(HexCoord(p, -q - p, -r - p)) for p, q, r in hex_map.coords]
+
+    def __len__(self) -> int:
+        return 2 * self.half
+
+    def index(self, cells: list[int], black_to_move: bool) -> int:
+        """The index of a position, from the cell of each piece in the order of the material set."""
+        return black_to_move * self.half + sum(cell * place for cell, place in zip(cells, self.places))
+
+    def result(self, index: int) -> tuple[int, int]:
+        """The result for the side to move, and the distance to mate in plies, of a position by index."""
+        return self.results[index >> 2] >> (index & 3) * 2 & 3, self.distances[index]
+
+    def save(self, path: str):
+        with open(path, "wb") as file:
+            file.write(HEADER.pack(MAGIC, self.radius, self.material.encode()))
+            file.write(self.results)
+            file.write(self.distances)
+
+    @staticmethod
+    def load(path: str) -> "Tablebase":
+        """Open a tablebase file. It is memory-mapped, so every process using it shares one copy."""
+        with open(path, "rb") as file:
+            data: mmap.mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, radius, material = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError(f"{path} isn't a tablebase")
+
+        material = material.rstrip(b"\0").decode()
+        size: int = 2 * (3 * radius * (radius + 1) + 1) ** len(parse_material(material))
+        results = memoryview(data)[HEADER.size:HEADER.size + (size + 3) // 4]
+        distances = memoryview(data)[HEADER.size + (size + 3) // 4:]
+        table: Tablebase = Tablebase(material, radius, results, distances)
+        table.mmap = data
+        return table
+
+    def close(self):
+        """Close the file of a tablebase that was loaded from one."""
+        if self.mmap is not None:
+            self.results.release()
+            self.distances.release()
+            self.mmap.close()
+
+    @staticmethod
+    def generate(material: str, radius: int = 5, subtables: Optional["TablebaseSet"] = None) -> "Tablebase":
+        """
+        Work out every position of a material set by retrograde analysis.
+        Checkmates are found first, then the search works backwards from them one ply at a time, taking back moves:
+        a position is won if some move leads to a lost position, and lost once every move leads to a won one. Captures
+        leave smaller material sets, which are looked up in `subtables`, generating any that are missing. Whatever is
+        left over at the end is drawn.
+        """
+        codes: list[int] = parse_material(material)
+        subtables = subtables if subtables is not None else TablebaseSet()
+        for i, code in enumerate(codes):
+            if code & TYPE_MASK != KING:
+                submaterial: str = material_of(codes[:i] + codes[i + 1:])
+                if submaterial != "KvK" and not subtables.covers(submaterial):
+                    subtables.add(Tablebase.generate(submaterial, radius, subtables))
+
+        size: int = 2 * (3 * radius * (radius + 1) + 1) ** len(codes)
+        table: Tablebase = Tablebase(material, radius, bytearray((size + 3) // 4), bytearray(size))
+        results: bytearray = table.results
+        distances: bytearray = table.distances
+
+        # For each position, how many of its moves aren't yet known to lead to a win for the other side. A position is
+        # lost when this reaches zero.
+        unknown_moves: bytearray = bytearray(size)
+
+        # The positions settled at each distance to mate, waiting to have their moves taken back. Wins by capture are
+        # only candidates, as a quicker win may turn up first.
+        settled: dict[int, array] = {}
+        capture_wins: dict[int, array] = {}
+
+        def settle(index: int, result: int, distance: int):
+            if distance > 255:
+                raise OverflowError(f"Distance to mate of {material} is over 255 plies")
+            results[index >> 2] |= result << (index & 3) * 2
+            distances[index] = distance
+            settled.setdefault(distance, array("I")).append(index)
+
+        hex_map: HexMap = HexMap.from_radius(radius)
+        board: bytearray = hex_map.board
+
+        # Find the illegal positions, the checkmates, and what the captures in each position lead to.
+        for index in range(size):
+            black_to_move: bool = index >= table.half
+            cells: list[int] = [index // place % table.cells for place in table.places]
+            if len(set(cells)) < len(cells):
+                results[index >> 2] |= ILLEGAL << (index & 3) * 2
+                continue
+
+            for cell, code in zip(cells, codes):
+                board[cell] = code
+            mover, waiter = ("b", "w") if black_to_move else ("w", "b")
+
+            if hex_map.is_king_checked(waiter):
+                results[index >> 2] |= ILLEGAL << (index & 3) * 2
+            else:
+                moves: list[tuple[int, int]] = hex_map.legal_moves(mover)
+                if not moves and hex_map.is_king_checked(mover):
+                    settle(index, LOSS, 0)
+
+                unknown: int = len(moves)
+                quickest_win: Optional[int] = None
+                slowest_loss: int = 0
+                for start, end in [(start, end) for start, end in moves if board[end] != EMPTY]:
+                    captured: int = board[end]
+                    board[start], board[end] = EMPTY, board[start]
+                    result, distance = subtables.probe_board(board, not black_to_move)
+                    board[start], board[end] = board[end], captured
+
+                    if result == LOSS:
+                        quickest_win = distance + 1 if quickest_win is None else min(quickest_win, distance + 1)
+                    elif result == WIN:
+                        unknown -= 1
+                        slowest_loss = max(slowest_loss, distance + 1)
+
+                unknown_moves[index] = unknown
+                distances[index] = slowest_loss
+                if quickest_win is not None:
+                    capture_wins.setdefault(quickest_win, array("I")).append(index)
+                elif moves and not unknown:
+                    settle(index, LOSS, slowest_loss)
+
+            for cell in cells:
+                board[cell] = EMPTY
+
+        # Take back moves from the settled positions, nearest to mate first.
+        distance: int = 0
+        while settled or capture_wins:
+            for index in capture_wins.pop(distance, []):
+                if results[index >> 2] >> (index & 3) * 2 & 3 == DRAW:
+                    settle(index, WIN, distance)
+
+            for index in settled.pop(distance, []):
+                black_to_move = index >= table.half
+                result: int = results[index >> 2] >> (index & 3) * 2 & 3
+                cells = [index // place % table.cells for place in table.places]
+                for cell, code in zip(cells, codes):
+                    board[cell] = code
+
+                # The side that just moved could have come from any empty cell its piece can reach along its rays.
+                # Pieces other than pawns move the same way in both directions.
+                moved_bit: int = 0 if black_to_move else BLACK
+                flipped: int = index - table.half if black_to_move else index + table.half
+                for i, (cell, code) in enumerate(zip(cells, codes)):
+                    if code & BLACK != moved_bit:
+                        continue
+                    for ray in hex_map.ray_table[code][cell]:
+                        for previous_cell in ray:
+                            if board[previous_cell] != EMPTY:
+                                break
+                            previous: int = flipped + (previous_cell - cell) * table.places[i]
+                            if results[previous >> 2] >> (previous & 3) * 2 & 3 != DRAW or not unknown_moves[previous]:
+                                continue
+
+                            if result == LOSS:
+                                settle(previous, WIN, distance + 1)
+                            else:
+                                unknown_moves[previous] -= 1
+                                distances[previous] = max(distances[previous], distance + 1)
+                                if not unknown_moves[previous]:
+                                    settle(previous, LOSS, distances[previous])
+
+                for cell in cells:
+                    board[cell] = EMPTY
+            distance += 1
+
+        # Draws have no distance to mate.
+        for index in range(size):
+            if results[index >> 2] >> (index & 3) * 2 & 3 in (DRAW, ILLEGAL):
+                distances[index] = 0
+
+        return table
+
+
+class TablebaseSet:
+    """The tablebases for a board size, looked up by the material on the board, whichever side has which pieces."""
+
+    def __init__(self, tables: Optional[list[Tablebase]] = None):
+        self.tables: dict[str, Tablebase] = {}
+        self.max_pieces: int = 2
+        for table in tables or []:
+            self.add(table)
+
+    def add(self, table: Tablebase):
+        self.tables[table.material] = table
+        self.max_pieces = max(self.max_pieces, len(table.codes))
+
+    def covers(self, material: str) -> bool:
+        return material in self.tables or swap_sides(material) in self.tables
+
+    @staticmethod
+    def load_directory(directory: str) -> "TablebaseSet":
+        """Open every tablebase file (named like KQvK.tb) in a directory."""
+        names: list[str] = sorted(name for name in os.listdir(directory) if name.endswith(".tb"))
+        return TablebaseSet([Tablebase.load(os.path.join(directory, name)) for name in names])
+
+    def probe_board(self, board: bytearray, black_to_move: bool) -> Optional[tuple[int, int]]:
+        """
+        The result for the side to move and the distance to mate of a board, or None if no tablebase covers it, as
+        with any board that has a pawn on it. Two bare kings are always a draw.
+        """
+        pieces: list[tuple[int, int]] = [(cell, code) for cell, code in enumerate(board) if code != EMPTY]
+        if any(code & TYPE_MASK not in letter_codes for _, code in pieces):
+            return None
+        if len(pieces) == 2:
+            return DRAW, 0
+        material: str = material_of([code for _, code in pieces])
+
+        swapped: bool = False
+        table: Optional[Tablebase] = self.tables.get(material)
+        if table is None:
+            table = self.tables.get(swap_sides(material))
+            if table is None or table.cells != len(board):
+                return None
+            # Turn the board around and swap the colours, so that it matches the tablebase.
+            pieces = [(table.mirror[cell], code ^ BLACK) for cell, code in pieces]
+            swapped = True
+        elif table.cells != len(board):
+            return None
+
+        # Pieces of the same kind can be matched up with either slot in the table, as both orders are stored.
+        cells: list[int] = []
+        for code in table.codes:
+            match: int = next(i for i, (_, piece) in enumerate(pieces) if piece == code)
+            cells.append(pieces.pop(match)[0])
+        return table.result(table.index(cells, black_to_move != swapped))
+
+    def probe(self, hex_map: HexMap) -> Optional[tuple[int, int]]:
+        """The result for the side to move and the distance to mate of a position, if a tablebase covers it."""
+        if len(hex_map.board) - hex_map.board.count(EMPTY) > self.max_pieces:
+            return None
+        return self.probe_board(hex_map.board, hex_map.ply % 2 == 1)
+
+    def best_move(self, hex_map: HexMap) -> Optional[tuple[int, int]]:
+        """
+        The tablebase's best move for the side to move: the quickest win, else a draw, else the slowest loss.
+        None if a tablebase doesn't cover the position and everything it leads to.
+        """
+        if self.probe(hex_map) is None:
+            return None
+
+        best_move: Optional[tuple[int, int]] = None
+        best_rank: Optional[tuple[int, int]] = None
+        for move in hex_map.legal_moves("b" if hex_map.ply % 2 else "w"):
+            hex_map.push(move)
+            result: Optional[tuple[int, int]] = self.probe(hex_map)
+            hex_map.pop()
+            if result is None:
+                return None
+
+            # Rank the moves by what they leave the other side with: a loss, quickest first, then a draw, then a win,
+            # slowest first.
+            reply, distance = result
+            rank: tuple[int, int] = (0, distance) if reply == LOSS else (1, 0) if reply == DRAW else (2, -distance)
+            if best_rank is None or rank < best_rank:
+                best_move, best_rank = move, rank
+        return best_move
+
+
+def generate_file(material: str, radius: int, directory: str) -> str:
+    """
+    Generate one tablebase into a directory, using any smaller ones already there. Any smaller ones that were missing
+    are generated along the way, and saved too, so that the engine can play on after a capture. Returns a summary.
+    """
+    subtables: TablebaseSet = TablebaseSet.load_directory(directory)
+    loaded: set[str] = set(subtables.tables)
+    table: Tablebase = Tablebase.generate(material, radius, subtables)
+    table.save(os.path.join(directory, f"{material}.tb"))
+    for name, subtable in subtables.tables.items():
+        if name not in loaded:
+            subtable.save(os.path.join(directory, f"{name}.tb"))
+
+    counts: list[int] = [0] * 4
+    longest: int = 0
+    for index in range(len(table)):
+        result, distance = table.result(index)
+        counts[result] += 1
+        longest = max(longest, distance)
+    return (f"{material}: {counts[WIN]} wins, {counts[DRAW]} draws, {counts[LOSS]} losses, "
+            f"{counts[ILLEGAL]} illegal, longest mate {longest} plies")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate endgame tablebases by retrograde analysis.")
+    parser.add_argument("materials", nargs="+", help="material sets, such as KQvK and KRvK")
+    parser.add_argument("--radius", type=int, default=5, help="board radius, 5 for Glinski's board")
+    parser.add_argument("--directory", default="tablebases", help="directory to write the tablebases to")
+    parser.add_argument("--workers", type=int, default=None, help="material sets to generate at once")
+    args = parser.parse_args()
+
+    os.makedirs(args.directory, exist_ok=True)
+
+    # The smaller sets the requested ones lead to are generated first, unless they are already there, so that no two
+    # workers build the same one. Sets with the same number of pieces don't depend on each other, so they run at once.
+    plan: list[str] = []
+    for requested in args.materials:
+        for name in submaterials(requested) + [requested]:
+            exists: bool = any(os.path.exists(os.path.join(args.directory, f"{each}.tb"))
+                               for each in (name, swap_sides(name)))
+            if name not in plan and swap_sides(name) not in plan and (name == requested or not exists):
+                plan.append(name)
+
+    with ProcessPoolExecutor(args.workers) as executor:
+        for pieces in sorted({len(parse_material(name)) for name in plan}):
+            level: list[str] = [name for name in plan if len(parse_material(name)) == pieces]
+            for summary in executor.map(generate_file, level, [args.radius] * len(level),
+                                        [args.directory] * len(level)):
+                print(summary, file=sys.stderr)
@@ -0,0 +1,189 @@
+import mmap
+import os
+import struct
+import tempfile
+import warnings
+from array import array
+from typing import Optional
+
+import evaluation
+
+# Bound flags. An empty slot has a flag of 0.
+EMPTY_SLOT, EXACT, LOWER, UPPER = range(4)
+
+# A table file starts with this, the version of the file format, the fingerprint of the evaluation its scores come from
+# and the number of buckets, followed by each array in turn, exactly as they sit in memory, so that opening a file is
+# only a matter of mapping it. Bump the version whenever what is stored changes meaning.
+MAGIC: bytes = b"HEXTT001"
+FORMAT_VERSION: int = 3
+HEADER: struct.Struct = struct.Struct("<8sIIQ")
+
+
+def checksum(depth: int, score: int, flag: int, move: int) -> int:
+    """
+    The data of an entry packed into 64 bits. Keys are stored XORed with it, so that an entry torn by two processes
+    writing it at once no longer matches its key, rather than giving one position's key with another's score.
+    """
+    return depth & 0xff | (score & 0xffffffff) << 8 | flag << 40 | move << 42
+
+
+class TranspositionTable:
+    """
+    A fixed-size transposition table, mapping position keys to the results of earlier searches.
+    Every entry holds a key, depth, score, bound flag and best move, stored in arrays that are allocated up front,
+    so the memory footprint stays flat however long the engine runs.
+
+    Entries are grouped in buckets of two slots: the first keeps the deepest search seen for the bucket
+    (depth-preferred), while the second is always replaced.
+
+    Given a `path`, the arrays live in a memory-mapped file instead, so that what was learned carries over to the next
+    session, and several processes on the machine can share one table. An existing file is mapped as it is, keeping
+    its own size. A file written in another format or with another evaluation is left alone, and the table is kept in
+    memory instead: delete the file to start it again.
+    Nothing locks the entries: a torn entry fails its checksum and reads as a miss.
+    """
+
+    # The bytes used by one entry across all the arrays.
+    ENTRY_SIZE: int = 8 + 1 + 4 + 1 + 4
+
+    def __init__(self, entries: Optional[int] = None, megabytes: Optional[float] = None, path: Optional[str] = None):
+        if entries is None:
+            entries = int((16 if megabytes is None else megabytes) * 1024 * 1024) // self.ENTRY_SIZE
+
+        self.buckets: int = max(1, entries // 2)
+        self.path: Optional[str] = path
+        self.mmap: Optional[mmap.mmap] = None
+
+        if path is None:
+            self.allocate()
+        else:
+            self.open(path)
+
+        self.hits: int = 0
+        self.misses: int = 0
+        self.collisions: int = 0
+
+    def allocate(self):
+        """Make the arrays in memory, empty."""
+        size: int = self.buckets * 2
+        self.keys = array("Q", [0]) * size
+        self.depths = array("b", [0]) * size
+        self.scores = array("i", [0]) * size
+        self.flags = array("B", [EMPTY_SLOT]) * size
+        self.moves = array("I", [0]) * size
+
+    def open(self, path: str):
+        """
+        Map the arrays onto a table file, creating it empty if it doesn't exist yet. Other processes may have a file
+        mapped, so one is never truncated: a file in another format or with another evaluation is left alone, and the
+        table is kept in memory instead.
+        """
+        fingerprint: int = evaluation.fingerprint()
+        if not os.path.exists(path):
+            self.create(path, fingerprint)
+        if not self.matches(path, fingerprint):
+            warnings.warn(f"{path} is from another format or evaluation, so the table is kept in memory instead")
+            self.path = None
+            self.allocate()
+            return
+
+        with open(path, "r+b") as file:
+            self.mmap = mmap.mmap(file.fileno(), 0)
+        self.buckets = HEADER.unpack_from(self.mmap)[3]
+
+        # Views of each array in turn, widest first so that each one is aligned.
+        size: int = self.buckets * 2
+        view: memoryview = memoryview(self.mmap)
+        offset: int = HEADER.size
+        for name, code, width in (("keys", "Q", 8), ("scores", "i", 4), ("moves", "I", 4), ("depths", "b", 1),
+                                  ("flags", "B", 1)):
+            setattr(self, name, view[offset:offset + size * width].cast(code))
+            offset += size * width
+
+    def create(self, path: str, fingerprint: int):
+        """
+        Make an empty table file. It is written in full under a temporary name, then linked into place only if there
+        is still nothing there, so that processes starting at once never see a half-made file or replace each other's.
+        """
+        descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)))
+        try:
+            with os.fdopen(descriptor, "wb") as file:
+                file.write(HEADER.pack(MAGIC, FORMAT_VERSION, fingerprint, self.buckets))
+                file.truncate(HEADER.size + self.buckets * 2 * self.ENTRY_SIZE)
+            os.link(temporary, path)
+        except FileExistsError:
+            pass  # Another process made it first, so theirs is used.
+        finally:
+            os.remove(temporary)
+
+    @staticmethod
+    def matches(path: str, fingerprint: int) -> bool:
+        """Whether a table file exists, in this format and with scores from the evaluation with this fingerprint."""
+        if not os.path.exists(path):
+            return False
+        with open(path, "rb") as file:
+            header: bytes = file.read(HEADER.size)
+        if len(header) < HEADER.size:
+            return False
+
+        magic, version, file_fingerprint, buckets = HEADER.unpack(header)
+        return (magic, version, file_fingerprint) == (MAGIC, FORMAT_VERSION, fingerprint) and \
+            os.path.getsize(path) == HEADER.size + buckets * 2 * TranspositionTable.ENTRY_SIZE
+
+    def flush(self):
+        """Write a table file's changes to disk. Other processes sharing the file see them straight away regardless."""
+        if self.mmap is not None:
+            self.mmap.flush()
+
+    def close(self):
+        """Flush and unmap a table file."""
+        if self.mmap is not None:
+            self.flush()
+            for name in ("keys", "scores", "moves", "depths", "flags"):
+                getattr(self, name).release()
+            self.mmap.close()
+            self.mmap = None
+
+    def __len__(self) -> int:
+        """The number of slots in the table."""
+        return len(self.keys)
+
+    def probe(self, key: int) -> Optional[tuple[int, int, int, int]]:
+        """Look up a position key, returning its (depth, score, flag, move) if it is stored."""
+        slot: int = key % self.buckets * 2
+
+        for i in (slot, slot + 1):
+            flag: int = self.flags[i]
+            if flag != EMPTY_SLOT:
+                depth, score, move = self.depths[i], self.scores[i], self.moves[i]
+                if self.keys[i] ^ checksum(depth, score, flag, move) == key:
+                    self.hits += 1
+                    return depth, score, flag, move
+
+        # The bucket holds other positions, which may have pushed this one out.
+        if self.flags[slot] != EMPTY_SLOT or self.flags[slot + 1] != EMPTY_SLOT:
+            self.collisions += 1
+
+        self.misses += 1
+        return None
+
+    def store(self, key: int, depth: int, score: int, flag: int, move: int = 0):
+        """Store the result of a search, replacing entries following the depth-preferred / always-replace policy."""
+        slot: int = key % self.buckets * 2
+
+        # Only take over the depth-preferred slot for the same position, or a search that is at least as deep.
+        if self.flags[slot] != EMPTY_SLOT and depth < self.depths[slot] and self.keys[slot] ^ checksum(
+                self.depths[slot], self.scores[slot], self.flags[slot], self.moves[slot]) != key:
+            slot += 1
+
+        self.keys[slot] = key ^ checksum(depth, score, flag, move)
+        self.depths[slot] = depth
+        self.scores[slot] = score
+        self.flags[slot] = flag
+        self.moves[slot] = move
+
+    def clear(self):
+        """Empty the table and reset the counters."""
+        self.flags[:] = array("B", [EMPTY_SLOT]) * len(self.flags)
+        self.flush()
+        self.hits = self.misses = self.collisions = 0
@@ -0,0 +1,114 @@
+import threading
+from typing import Optional
+
+from ai import AI
+from hex import HexMap, HexCoord
+
+
+class SearchWorker:
+    """
+    Runs `AI.move` in a background thread, so that the game keeps drawing and handling events while Black thinks.
+    Start a search with `start`, and `poll` for Black's move once a frame.
+    A move is only handed back for the position it was searched in, so a board that has moved on meanwhile is safe.
+
+    While White thinks, the worker ponders: it guesses White's reply from the transposition table, and searches Black's
+    answer to it. If White plays the guessed move, that search simply carries on as the real one, with its time limit
+    counted from then. Otherwise it is thrown away, though the table entries it filled in still help the next search.
+
+    The search runs on a copy of the board, so the game's board can still be read while it runs, and `AI`'s search
+    state is shared, so only one worker should be used at a time.
+    """
+
+    def __init__(self, time_limit: Optional[float] = None, max_depth: int = 4):
+        self.time_limit: Optional[float] = time_limit
+        self.max_depth: int = max_depth
+
+        self.thread: Optional[threading.Thread] = None
+        self.stop: threading.Event = threading.Event()
+        self.timer: Optional[threading.Timer] = None
+        self.result: Optional[tuple[HexCoord, HexCoord]] = None
+
+        # The key of the position the result is a move in.
+        self.search_key: Optional[int] = None
+
+        # While pondering, the key of the position being searched, which is the one after White's guessed reply.
+        self.ponder_key: Optional[int] = None
+
+    @property
+    def pondering(self) -> bool:
+        return self.ponder_key is not None
+
+    @property
+    def thinking(self) -> bool:
+        """Whether Black's move is being searched for, or is ready to be polled."""
+        return self.thread is not None and not self.pondering
+
+    def start(self, hex_map: HexMap):
+        """Start searching for Black's move in a position, carrying on with the ponder search if it guessed right."""
+        if self.pondering and self.ponder_key == hex_map.key:
+            self.ponder_key = None
+            if self.time_limit is not None and self.thread.is_alive():
+                self.timer = threading.Timer(self.time_limit, self.stop.set)
+                self.timer.start()
+            return
+
+        self.cancel()
+        self.search(hex_map)
+
+    def ponder(self, hex_map: HexMap):
+        """Once Black has moved, start searching Black's answer to White's expected reply, without a time limit."""
+        self.cancel()
+
+        reply: Optional[tuple[int, int]] = AI.predicted_move(hex_map)
+        if reply is None:
+            return
+
+        position: HexMap = HexMap.from_bytes(hex_map.to_bytes())
+        position.push(reply)
+        if not position.has_any_legal_move("b"):
+            return
+
+        self.ponder_key = position.key
+        self.search(position)
+
+    def search(self, hex_map: HexMap):
+        """Search a copy of the position in the background. Ponder searches wait for `start` to set their time limit."""
+        position: HexMap = HexMap.from_bytes(hex_map.to_bytes())
+        time_limit: Optional[float] = None if self.pondering else self.time_limit
+
+        def run():
+            self.result = AI.move(position, time_limit=time_limit, max_depth=self.max_depth, stop=self.stop)
+
+        self.stop.clear()
+        self.result = None
+        self.search_key = position.key
+        self.thread = threading.Thread(target=run, daemon=True)
+        self.thread.start()
+
+    def poll(self, hex_map: HexMap) -> Optional[tuple[HexCoord, HexCoord]]:
+        """
+        Black's move in a position, once the search for it has finished. None while it is still thinking, or only
+        pondering. A move searched in any other position is thrown away, rather than played on the wrong board.
+        """
+        if self.thread is None or self.thread.is_alive() or self.pondering:
+            return None
+
+        self.thread = None
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if self.search_key != hex_map.key:
+            return None
+        return self.result
+
+    def cancel(self):
+        """Stop any search under way, throwing its move away. Call this before the game closes."""
+        self.ponder_key = None
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+        if self.thread is not None:
+            self.stop.set()
+            self.thread.join()
+            self.thread = None
@@ -0,0 +1,112 @@
+import math
+import time
+import unittest
+
+from ai import AI, SearchStats
+from hex import HexCoord, HexMap, CAPTURE, unpack_move
+
+
+class AITest(unittest.TestCase):
+    def test_time_limit(self):
+        hex_map = HexMap.from_glinski()
+        hex_map.push((HexCoord(0, -1, 1), HexCoord(0, 0, 0)))
+        key = hex_map.key
+
+        start_time = time.perf_counter()
+        start, end = AI.move(hex_map, time_limit=0.5, max_depth=20)
+        self.assertLess(time.perf_counter() - start_time, 2)
+
+        # The abandoned search must leave nothing behind on the board but the chosen move.
+        self.assertEqual(hex_map.ply, 2)
+        hex_map.pop()
+        self.assertEqual(hex_map.key, key)
+        self.assertIn((start, end), list(hex_map.moves_for_col("b")))
+
+    def test_node_limit(self):
+        hex_map = HexMap.from_glinski()
+        hex_map.push((HexCoord(0, -1, 1), HexCoord(0, 0, 0)))
+
+        AI.move(hex_map, max_depth=20, node_limit=2000)
+        self.assertLessEqual(AI.nodes, 2001)
+
+    def test_move_ordering(self):
+        hex_map = HexMap.from_glinski()
+        for move in [((0, -1, 1), (0, 0, 0)), ((-1, 2, -1), (-1, 1, 0))]:
+            hex_map.push(tuple(HexCoord(*coord) for coord in move))
+
+        quiet = hex_map.legal_move_codes("w", captures=False)[5]
+        AI.killers = {hex_map.ply: [quiet]}
+        moves = list(AI.ordered_moves(hex_map, "w", tt_move=quiet))
+
+        # Every legal move comes out exactly once, with the table move first and then the captures, which are flagged.
+        self.assertEqual(sorted(moves), sorted(hex_map.legal_move_codes("w")))
+        self.assertEqual(moves[0], quiet)
+        captures = hex_map.legal_move_codes("w", quiets=False)
+        self.assertEqual(set(moves[1:len(captures) + 1]), set(captures))
+        self.assertTrue(all(move & CAPTURE for move in captures))
+
+        # The most valuable victim is taken first.
+        self.assertEqual(max(AI.piece_values[hex_map.board[unpack_move(move)[1]]] for move in captures),
+                         AI.piece_values[hex_map.board[unpack_move(moves[1])[1]]])
+
+    def test_search_stats(self):
+        hex_map = HexMap.from_glinski()
+        hex_map.push(hex_map.parse_move("f5f6"))
+
+        stats = SearchStats()
+        start, end = AI.move(hex_map, max_depth=3, stats=stats)
+
+        self.assertEqual(stats.depth, 3)
+        self.assertEqual([iteration["depth"] for iteration in stats.iterations], [1, 2, 3])
+        self.assertEqual(stats.nodes, stats.iterations[-1]["nodes"])
+        self.assertGreater(stats.beta_cutoffs, 0)
+        self.assertLessEqual(stats.first_move_cutoff_rate, 1)
+        self.assertEqual(stats.principal_variation[0], hex_map.move_name((start, end)))
+        self.assertIsNone(AI.stats)
+
+    def test_quiescence(self):
+        hex_map = HexMap.from_radius(5)
+        for state, cell in [("w_king", "g1"), ("b_king", "g10"), ("w_pawn", "f5"), ("w_pawn", "e4"), ("b_queen", "f9")]:
+            hex_map[hex_map.parse_cell(cell)] = state
+        hex_map.ply = 1
+
+        # Taking the pawn on f5 looks good to a plain evaluation, but the quiescence search sees the recapture.
+        hex_map.push(hex_map.parse_move("f9f5"))
+        self.assertGreater(AI.evaluate(hex_map), 200)
+        self.assertLess(AI.quiesce(hex_map, -math.inf, math.inf, False), 0)
+        hex_map.pop()
+
+        AI.cache.clear()
+        start, end = AI.move(hex_map, max_depth=1)
+        self.assertNotEqual(hex_map.move_name((start, end)), "f9f5")
+
+    def test_mate_and_stalemate(self):
+        hex_map = HexMap.from_radius(5)
+        for state, cell in [("w_king", "a1"), ("b_king", "c3"), ("b_queen", "e4"), ("b_rook", "d7")]:
+            hex_map[hex_map.parse_cell(cell)] = state
+
+        # With White to move, White has no moves but isn't in check, so it is stalemate.
+        AI.cache.clear()
+        self.assertEqual(AI.minimax(hex_map, 2, -math.inf, math.inf, False), 0)
+
+        # With Black to move, Black should find a mate rather than settle for the stalemate.
+        hex_map.ply = 1
+        AI.move(hex_map, max_depth=3)
+        self.assertTrue(hex_map.is_king_checkmated("w"))
+
+    def test_mate_score_from_cache(self):
+        hex_map = HexMap.from_radius(5)
+        for state, cell in [("w_king", "a1"), ("b_king", "c3"), ("b_queen", "e4"), ("b_rook", "d7")]:
+            hex_map[hex_map.parse_cell(cell)] = state
+        hex_map.ply = 1
+        AI.cache.clear()
+        score = AI.minimax(hex_map, 3, -math.inf, math.inf, True)
+        self.assertGreater(score, AI.mate_threshold)
+
+        # Reached again later in the game, the mate read from the table is just as many plies away.
+        hex_map.ply = 11
+        self.assertEqual(AI.minimax(hex_map, 3, -math.inf, math.inf, True), score - 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
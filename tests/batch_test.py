@@ -0,0 +1,53 @@
+import unittest
+
+from ai import AI
+from hex import HexMap
+
+try:
+    import numpy
+    import batch
+except ImportError:
+    numpy = None
+
+
+@unittest.skipIf(numpy is None, "needs NumPy")
+class BatchTest(unittest.TestCase):
+    def positions(self):
+        hex_map = HexMap.from_glinski()
+        positions = [HexMap.from_glinski()]
+        for move in ["f5f6", "e7e6", "d1f4", "e6f6"]:
+            hex_map.push(hex_map.parse_move(move))
+            positions.append(HexMap.from_bytes(hex_map.to_bytes()))
+        return positions
+
+    def test_arrays(self):
+        positions = self.positions()
+        boards = batch.to_array(positions)
+        self.assertEqual(boards.shape, (5, 91))
+        self.assertEqual(bytes(boards[3]), bytes(positions[3].board))
+
+        # Every piece is in exactly one plane.
+        planes = batch.one_hot(boards)
+        self.assertEqual(planes.shape, (5, 12, 91))
+        self.assertTrue((planes.sum(axis=1) == (boards != 0)).all())
+
+    def test_evaluate(self):
+        positions = self.positions()
+        self.assertEqual(list(batch.evaluate(batch.to_array(positions))), [AI.evaluate(p) for p in positions])
+
+    def test_mobility(self):
+        moves, attacks = batch.mobility(batch.to_array(self.positions()))
+
+        # Nothing is pinned at the start, and neither king can move, so every pseudo-legal move is legal.
+        self.assertEqual(list(moves[0]), [43, 43])
+
+        # The same holds once a knight has come out and a pawn has been taken.
+        hex_map = self.positions()[-1]
+        self.assertEqual(list(moves[-1]), [len(hex_map.legal_moves("w")), len(hex_map.legal_moves("b"))])
+
+        # The knight attacks more cells from the middle of the board than from its own back rank.
+        self.assertGreater(attacks[-1, 0], attacks[0, 0])
+
+
+if __name__ == '__main__':
+    unittest.main()
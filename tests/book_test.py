@@ -0,0 +1,70 @@
+import os
+import tempfile
+import unittest
+
+from ai import AI
+from book import OpeningBook, build_book
+from hex import HexMap
+
+
+class OpeningBookTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "book.bin")
+
+        records = [
+            {"moves": ["f5f6", "e7e6", "d1f4"], "result": "1-0"},
+            {"moves": ["f5f6", "d7d6"], "result": "1/2-1/2"},
+            {"moves": ["d3d4", "e7e6"], "result": "0-1"},
+        ]
+        self.assertEqual(build_book(records, self.path, max_plies=2), 3)
+        self.book = OpeningBook(self.path)
+
+    def tearDown(self):
+        self.book.close()
+        self.directory.cleanup()
+
+    def test_probe(self):
+        hex_map = HexMap.from_glinski()
+
+        # White won once and drew once after f5f6, but only lost after d3d4, so d3d4 is left out.
+        self.assertEqual(self.book.probe(hex_map.key), [(hex_map.parse_move("f5f6"), 3)])
+
+        # Black lost the game with e7e6 here, so only the draw is kept.
+        hex_map.push(hex_map.parse_move("f5f6"))
+        self.assertEqual(self.book.probe(hex_map.key), [(hex_map.parse_move("d7d6"), 1)])
+        self.assertEqual(self.book.probe(hex_map.key ^ 1), [])
+
+    def test_choose(self):
+        hex_map = HexMap.from_glinski()
+        self.assertEqual(hex_map.move_name(self.book.choose(hex_map)), "f5f6")
+
+        # A move that isn't legal where it is found, as after a key collision, is never chosen.
+        board_key = hex_map.board_key
+        hex_map[hex_map.parse_cell("f6")] = "w_knight"
+        hex_map.board_key = board_key
+        self.assertIsNone(self.book.choose(hex_map))
+
+    def test_ai_move(self):
+        hex_map = HexMap.from_glinski()
+        AI.book = self.book
+        try:
+            AI.nodes = 0
+            self.assertEqual(hex_map.move_name(AI.move(hex_map, max_depth=8)), "f5f6")
+            self.assertEqual(hex_map.move_name(AI.move(hex_map, max_depth=8)), "d7d6")
+            self.assertEqual(AI.nodes, 0)
+
+            # Out of the book, the AI searches as usual.
+            AI.move(hex_map, max_depth=1)
+            self.assertGreater(AI.nodes, 0)
+        finally:
+            AI.book = None
+
+    def test_not_a_book(self):
+        with open(self.path, "wb") as file:
+            file.write(b"something else")
+        self.assertRaises(ValueError, OpeningBook, self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
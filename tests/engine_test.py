@@ -0,0 +1,58 @@
+import io
+import unittest
+
+from engine import Engine
+from hex import HexMap
+
+
+class EngineTest(unittest.TestCase):
+    def setUp(self):
+        self.output = io.StringIO()
+        self.engine = Engine(self.output)
+
+    def lines(self) -> list[str]:
+        return self.output.getvalue().splitlines()
+
+    def test_search(self):
+        self.engine.run(io.StringIO("uci\nisready\nposition startpos moves f5f6 e7e6\ngo depth 2\n"))
+        lines = self.lines()
+        self.assertEqual(lines[:3], ["id name Hexagonal Chess", "uciok", "readyok"])
+        self.assertTrue(lines[3].startswith("info depth 1 score cp "))
+        self.assertTrue(lines[4].startswith("info depth 2 score cp "))
+
+        # The best move is the first move of the principal variation, and legal after the moves that were set up.
+        best_move = lines[5].split()[1]
+        self.assertEqual(lines[5], f"bestmove {best_move}")
+        self.assertEqual(lines[4].split(" pv ")[1].split()[0], best_move)
+        hex_map = self.engine.hex_map
+        self.assertEqual(hex_map.ply, 2)
+        self.assertIn(hex_map.parse_move(best_move), hex_map.legal_moves("w"))
+
+    def test_stop(self):
+        self.engine.handle("go infinite")
+        self.engine.handle("stop")
+        self.assertTrue(self.lines()[-1].startswith("bestmove "))
+        self.assertFalse(self.engine.handle("quit"))
+
+    def test_position(self):
+        hex_map = HexMap.from_glinski()
+        hex_map.push(hex_map.parse_move("f5f6"))
+        self.engine.handle(f"position bytes {hex_map.to_bytes().hex()} moves e7e6 d1f4")
+        self.assertEqual(self.engine.hex_map.ply, 3)
+
+        # Moves stop being played at the first illegal one.
+        self.engine.handle("position startpos moves f5f6 f6f7")
+        self.assertEqual(self.engine.hex_map.ply, 1)
+        self.assertEqual(self.lines(), ["info string illegal move f6f7, stopping before it"])
+
+    def test_mate_score(self):
+        # Mate scores count plies to the mated position, reported in moves of the side to move: mated after Black's
+        # second move, or mating with White's next move.
+        self.engine.send_info({"depth": 1, "score": -100000 + 4, "nodes": 1, "seconds": 0, "pv": []})
+        self.engine.send_info({"depth": 1, "score": 100000 - 1, "nodes": 1, "seconds": 0, "pv": ["a1a2"]})
+        self.assertEqual(self.lines(), ["info depth 1 score mate -2 nodes 1 time 0 nps 0 pv ",
+                                        "info depth 1 score mate 1 nodes 1 time 0 nps 0 pv a1a2"])
+
+
+if __name__ == '__main__':
+    unittest.main()
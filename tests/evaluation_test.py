@@ -0,0 +1,37 @@
+import unittest
+
+import evaluation
+from hex import HexCoord, HexMap
+
+
+class EvaluationTest(unittest.TestCase):
+    def test_symmetry(self):
+        # Glinski's layout is symmetric between the colours, so neither side is ahead.
+        hex_map = HexMap.from_glinski()
+        self.assertEqual(hex_map.score, 0)
+
+        # The tables are mirrored: a piece on its side's version of a cell is worth the same for either colour.
+        for p, q, r in [(0, -1, 1), (2, -3, 1), (-4, 0, 4)]:
+            for piece_type in evaluation.material:
+                self.assertEqual(evaluation.square_value(f"w_{piece_type}", p, q, r, 5),
+                                 evaluation.square_value(f"b_{piece_type}", p, -q - p, -r - p, 5))
+
+    def test_incremental_score(self):
+        hex_map = HexMap.from_glinski()
+        for move in ["f5f6", "e7e6", "f3c6", "f7f6"]:
+            hex_map.push(hex_map.parse_move(move))
+            self.assertEqual(hex_map.score, hex_map.compute_score())
+
+        for _ in range(4):
+            hex_map.pop()
+        self.assertEqual(hex_map.score, 0)
+
+        # Advancing a pawn and centralising a piece are both worth something.
+        self.assertGreater(evaluation.square_value("w_pawn", 0, 0, 0, 5),
+                           evaluation.square_value("w_pawn", 0, -1, 1, 5))
+        self.assertGreater(evaluation.square_value("b_knight", *HexCoord(0, 0, 0), 5),
+                           evaluation.square_value("b_knight", *HexCoord(0, 5, -5), 5))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,6 @@
 import unittest
 
-from hex import HexCoord
+from hex import HexCoord, HexMap, piece_codes, NORMAL, CHECK, CHECKMATE, STALEMATE
 
 
 class HexCoordTest(unittest.TestCase):
@@ -23,6 +23,165 @@ class HexCoordTest(unittest.TestCase):
         self.assertEqual(round(HexCoord(0.222, 1.1, -1.322)), HexCoord(0, 1, -1))
         self.assertEqual(round(HexCoord(0, 0.5, -0.5)), HexCoord(0, 0, 0))
 
+    def test_interning(self):
+        hex_map = HexMap.from_glinski()
+        for index, coord in enumerate(hex_map.coords):
+            self.assertIs(HexCoord(coord.p, coord.q, coord.r), coord)
+            self.assertEqual(coord.index, index)
+
+        # Arithmetic lands on the canonical cell, while off-board and fractional coordinates stand alone.
+        self.assertIs(HexCoord(1, -1, 0) + HexCoord(-1, 0, 1), HexCoord(0, -1, 1))
+        self.assertIs(round(HexCoord(0.222, 1.1, -1.322)), HexCoord(0, 1, -1))
+        self.assertEqual(HexCoord(-4, -2, 6).index, -1)
+        self.assertEqual(HexCoord(0, 0.25, -0.25).index, -1)
+        self.assertNotIn(HexCoord(-4, -2, 6), hex_map)
+        self.assertEqual(hash(HexCoord(0.5, 0, -0.5)), hash(HexCoord(0.5, 0, -0.5)))
+
+        with self.assertRaises(AttributeError):
+            HexCoord(0, 0, 0).p = 1
+
+
+class HexMapTest(unittest.TestCase):
+    def test_ray_table(self):
+        hex_map = HexMap.from_radius(5)
+        index = lambda *coord: hex_map.coord_to_cell_registry[HexCoord(*coord)]
+
+        # A rook on the centre cell can slide all the way to the edge along each vector.
+        self.assertEqual(hex_map.ray_table[piece_codes["w_rook"]][index(0, 0, 0)][0],
+                         [index(0, n, -n) for n in range(1, 6)])
+
+        # Off-board cells are removed, so a corner rook has empty rays.
+        self.assertEqual(hex_map.ray_table[piece_codes["b_rook"]][index(5, -5, 0)][2], [])
+
+        # Non-sliding pieces only take a single step along each vector.
+        self.assertEqual(hex_map.ray_table[piece_codes["w_king"]][index(0, 0, 0)][0], [index(0, 1, -1)])
+        self.assertEqual(hex_map.ray_table[piece_codes["b_knight"]][index(0, 0, 0)][0], [index(2, 1, -3)])
+
+    def test_push_pop(self):
+        hex_map = HexMap.from_glinski()
+        initial = str(hex_map)
+
+        # Make a capture three plies deep, then undo everything.
+        for move in [((0, -1, 1), (0, 0, 0)), ((-1, 2, -1), (-1, 1, 0)), ((0, 0, 0), (-1, 1, 0))]:
+            hex_map.push(tuple(HexCoord(*coord) for coord in move))
+
+        self.assertEqual(hex_map.ply, 3)
+        self.assertEqual(hex_map[HexCoord(-1, 1, 0)], "w_pawn")
+        self.assertEqual(hex_map.board.count(piece_codes["b_pawn"]), 8)
+
+        for _ in range(3):
+            hex_map.pop()
+
+        self.assertEqual(hex_map.ply, 0)
+        self.assertEqual(str(hex_map), initial)
+
+    def test_square_attacked(self):
+        hex_map = HexMap.from_radius(5)
+        hex_map[HexCoord(0, 0, 0)] = "b_rook"
+        hex_map[HexCoord(0, 2, -2)] = "w_pawn"
+
+        # The rook attacks along its lines up to and including the first blocker.
+        self.assertTrue(hex_map.is_square_attacked(HexCoord(0, 2, -2), "b"))
+        self.assertTrue(hex_map.is_square_attacked(HexCoord(-5, 0, 5), "b"))
+        self.assertFalse(hex_map.is_square_attacked(HexCoord(0, 3, -3), "b"))
+
+        # Pawns only attack along their 'diagonal' capture vectors, not forwards.
+        self.assertTrue(hex_map.is_square_attacked(HexCoord(-1, 3, -2), "w"))
+        self.assertTrue(hex_map.is_square_attacked(HexCoord(1, 2, -3), "w"))
+        self.assertFalse(hex_map.is_square_attacked(HexCoord(0, 3, -3), "w"))
+
+    def test_legal_moves(self):
+        hex_map = HexMap.from_radius(5)
+        index = lambda *coord: hex_map.coord_to_cell_registry[HexCoord(*coord)]
+        hex_map[HexCoord(0, -5, 5)] = "w_king"
+        hex_map[HexCoord(0, -3, 3)] = "w_rook"
+        hex_map[HexCoord(0, 5, -5)] = "b_queen"
+        hex_map[HexCoord(3, -5, 2)] = "w_knight"
+        hex_map[HexCoord(-5, 5, 0)] = "b_king"
+
+        # The rook is pinned, so it can only move along the line between the king and the queen.
+        rook_moves = {end for _, end in hex_map.legal_moves("w", HexCoord(0, -3, 3))}
+        self.assertEqual(rook_moves, {index(0, n, -n) for n in range(-4, 6) if n != -3})
+
+        # With the rook gone, the king is in check: only king moves and blocks or captures of the queen are legal.
+        hex_map[HexCoord(0, -3, 3)] = None
+        self.assertTrue(hex_map.is_king_checked("w"))
+        for start, end in hex_map.legal_moves("w"):
+            hex_map.push((start, end))
+            self.assertFalse(hex_map.is_king_checked("w"))
+            hex_map.pop()
+        self.assertIn((index(3, -5, 2), index(0, -3, 3)), hex_map.legal_moves("w"))
+
+    def test_game_status(self):
+        self.assertEqual(HexMap.from_glinski().game_status("w"), NORMAL)
+
+        hex_map = HexMap.from_radius(5)
+        for state, cell in [("w_king", "a1"), ("b_king", "c3"), ("b_queen", "e4"), ("b_rook", "d7")]:
+            hex_map[hex_map.parse_cell(cell)] = state
+
+        # White's king has nowhere to go, but isn't in check. Black's king has somewhere to go.
+        self.assertEqual(hex_map.game_status("w"), STALEMATE)
+        self.assertFalse(hex_map.has_any_legal_move("w"))
+        self.assertTrue(hex_map.has_any_legal_move("b"))
+
+        # After each of Black's moves, the status agrees with the full list of White's legal moves.
+        for move in hex_map.legal_moves("b"):
+            hex_map.push(move)
+            status = hex_map.game_status("w")
+            self.assertEqual(status == NORMAL, bool(hex_map.legal_moves("w")) and not hex_map.is_king_checked("w"))
+            self.assertEqual(status == CHECKMATE, hex_map.is_king_checkmated("w"))
+            self.assertEqual(hex_map.has_any_legal_move("w"), bool(hex_map.legal_moves("w")))
+            if status == CHECK:
+                self.assertTrue(hex_map.is_king_checked("w"))
+            hex_map.pop()
+
+    def test_zobrist_key(self):
+        hex_map = HexMap.from_glinski()
+        initial_key = hex_map.key
+        self.assertEqual(initial_key, hex_map.compute_key())
+
+        # The same position reached by two move orders has the same key.
+        moves = [((-1, -4, 5), (-1, -3, 4)), ((1, 1, -2), (1, 0, -1)), ((0, -1, 1), (0, 0, 0))]
+        for move in moves:
+            hex_map.push(tuple(HexCoord(*coord) for coord in move))
+            self.assertEqual(hex_map.key, hex_map.compute_key())
+        key = hex_map.key
+
+        for _ in moves:
+            hex_map.pop()
+        self.assertEqual(hex_map.key, initial_key)
+
+        for move in reversed(moves):
+            hex_map.push(tuple(HexCoord(*coord) for coord in move))
+        self.assertEqual(hex_map.key, key)
+
+        # The side to move is part of the key.
+        self.assertNotEqual(hex_map.key, hex_map.board_key)
+
+    def test_notation(self):
+        hex_map = HexMap.from_glinski()
+
+        # Glinski's notation puts White's king on g1, queen on e1 and bishops on f1 to f3.
+        self.assertEqual(hex_map[hex_map.parse_cell("g1")], "w_king")
+        self.assertEqual(hex_map[hex_map.parse_cell("e1")], "w_queen")
+        self.assertEqual([hex_map[hex_map.parse_cell(f"f{n}")] for n in range(1, 4)], ["w_bishop"] * 3)
+        self.assertEqual(hex_map.cell_name(HexCoord(1, 4, -5)), "g10")
+
+        for index in range(91):
+            self.assertEqual(hex_map.parse_cell(hex_map.cell_name(index)), index)
+        self.assertEqual(hex_map.move_name(hex_map.parse_move("f10f11")), "f10f11")
+
+        for name in ["j1", "a7", "f12", "f", "ff"]:
+            self.assertRaises(ValueError, hex_map.parse_cell, name)
+
+    def test_from_str(self):
+        hex_map = HexMap.from_glinski()
+        hex_map.push(hex_map.parse_move("f5f6"))
+
+        copied = HexMap.from_str(str(hex_map), hex_map.ply)
+        self.assertEqual(str(copied), str(hex_map))
+        self.assertEqual(copied.key, hex_map.key)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,33 @@
+import unittest
+
+from ai import AI
+from hex import HexCoord, HexMap
+from parallel import ParallelSearch
+
+
+class ParallelSearchTest(unittest.TestCase):
+    def test_same_move_as_serial(self):
+        hex_map = HexMap.from_glinski()
+        for move in [((0, -1, 1), (0, 0, 0)), ((-1, 2, -1), (-1, 1, 0)), ((-1, -4, 5), (-1, -3, 4))]:
+            hex_map.push(tuple(HexCoord(*coord) for coord in move))
+        moves = hex_map.legal_moves("b")
+
+        with ParallelSearch(workers=2) as search:
+            for depth in [1, 2, 3]:
+                AI.cache.clear()
+                self.assertEqual(search.search_root(hex_map, depth, moves), AI.search_root(hex_map, depth, moves))
+
+    def test_move(self):
+        hex_map = HexMap.from_glinski()
+        hex_map.push((HexCoord(0, -1, 1), HexCoord(0, 0, 0)))
+
+        with ParallelSearch(workers=2) as search:
+            start, end = AI.move(hex_map, max_depth=2, parallel=search)
+
+        self.assertEqual(hex_map.ply, 2)
+        hex_map.pop()
+        self.assertIn((start, end), list(hex_map.moves_for_col("b")))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,27 @@
+import unittest
+
+from perft import divide, load_position, perft, test_positions
+
+
+class PerftTest(unittest.TestCase):
+    def test_reference_counts(self):
+        for name, (_, _, counts) in test_positions.items():
+            for depth, count in enumerate(counts, start=1):
+                with self.subTest(position=name, depth=depth):
+                    self.assertEqual(perft(load_position(name), depth), count)
+
+    def test_divide(self):
+        hex_map = load_position("start")
+        counts = divide(hex_map, 2)
+
+        self.assertEqual(len(counts), 43)
+        self.assertEqual(sum(counts.values()), 1846)
+        self.assertEqual(counts["f5f6"], 42)
+
+        # Perft must leave the position as it found it.
+        self.assertEqual(str(hex_map), test_positions["start"][0])
+        self.assertEqual(hex_map.key, hex_map.compute_key())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import json
+import os
+import tempfile
+import unittest
+
+from ai import AI
+from hex import HexMap
+from selfplay import EngineConfig, play_game, match_score, elo_difference, run_match
+
+
+class SelfPlayTest(unittest.TestCase):
+    def test_play_game(self):
+        record = play_game(0, EngineConfig(1), EngineConfig(2), opening_seed=5, random_plies=2, max_plies=6)
+        self.assertEqual(len(record["opening"]), 2)
+        self.assertEqual(record["plies"], 6)
+        self.assertEqual((record["result"], record["reason"]), ("1/2-1/2", "move limit"))
+
+        # The record replays as a legal game, and the same seed gives the same opening.
+        hex_map = HexMap.from_glinski()
+        for name in record["opening"] + record["moves"]:
+            move = hex_map.parse_move(name)
+            self.assertIn(move, hex_map.legal_moves("b" if hex_map.ply % 2 else "w"))
+            hex_map.push(move)
+        self.assertEqual(play_game(1, EngineConfig(1), EngineConfig(1), 5, 2, 2)["opening"], record["opening"])
+
+    def test_separate_tables(self):
+        AI.cache.clear()
+        cache, history = AI.cache, AI.history
+        play_game(0, EngineConfig(2), EngineConfig(3), opening_seed=1, max_plies=4)
+
+        # Each side searched with its own table and history, leaving the shared ones untouched.
+        self.assertIs(AI.cache, cache)
+        self.assertIs(AI.history, history)
+        self.assertEqual((cache.hits, cache.misses), (0, 0))
+
+    def test_match_score(self):
+        self.assertEqual(match_score([1, 0.5, 0.5, 0]), (0.5, 1.96 * (0.5 / 3) ** 0.5 / 2))
+        self.assertEqual(elo_difference(0.5), 0)
+        self.assertAlmostEqual(elo_difference(0.75), 190.85, places=2)
+
+    def test_run_match(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, "games.jsonl")
+            scores = run_match(2, EngineConfig(1), EngineConfig(1), workers=1, max_plies=4, output=output)
+
+            with open(output) as file:
+                records = [json.loads(line) for line in file]
+
+        self.assertEqual(scores, [0.5, 0.5])
+        self.assertEqual(sorted(record["white"] for record in records), ["A", "B"])
+
+
+if __name__ == '__main__':
+    unittest.main()
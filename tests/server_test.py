@@ -0,0 +1,65 @@
+import asyncio
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from loadtest import run_load_test
+from server import GameServer
+
+
+class GameServerTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        # One search thread is enough here, and quicker to start than worker processes.
+        self.executor = ThreadPoolExecutor(1)
+        self.server = GameServer(self.executor, 1, max_depth=1, move_time=0.1, clock=60)
+
+    async def asyncTearDown(self):
+        self.executor.shutdown()
+
+    async def test_game(self):
+        # Playing Black, the engine moves first.
+        state = await self.server.handle({"op": "new", "color": "b"})
+        self.assertEqual((state["ply"], state["to_move"]), (1, "b"))
+        self.assertIn("e7e6", state["legal_moves"])
+        self.assertLess(state["clocks"]["w"], 60)
+
+        state = await self.server.handle({"op": "move", "game": state["game"], "move": "e7e6"})
+        self.assertEqual(state["ply"], 3)
+
+        with self.assertRaises(ValueError):
+            await self.server.handle({"op": "move", "game": state["game"], "move": "e6e4"})
+        with self.assertRaises(ValueError):
+            await self.server.handle({"op": "state", "game": 99})
+
+        metrics = self.server.metrics()
+        self.assertEqual((metrics["games"], metrics["queue_depth"], metrics["running_searches"]), (1, 0, 0))
+
+    async def test_time_budget(self):
+        state = await self.server.handle({"op": "new", "color": "w"})
+        self.server.games[state["game"]].clocks["w"] = 0
+        state = await self.server.handle({"op": "state", "game": state["game"]})
+        self.assertEqual((state["result"], state["reason"]), ("0-1", "time"))
+
+    async def test_load(self):
+        listener = await asyncio.start_server(self.server.handle_client, "127.0.0.1", 0)
+        port = listener.sockets[0].getsockname()[1]
+        async with listener:
+            report = await run_load_test(4, port=port, max_moves=2)
+
+        self.assertEqual((report["errors"], report["moves"]), (0, 8))
+        self.assertEqual(report["server"]["games"], 0)
+        self.assertEqual(report["server"]["requests"], 4 * 4)
+
+    async def test_load_when_busy(self):
+        # With room for only one waiting search, some moves are turned away and tried again, without being counted.
+        self.server.max_queue = 1
+        listener = await asyncio.start_server(self.server.handle_client, "127.0.0.1", 0)
+        port = listener.sockets[0].getsockname()[1]
+        async with listener:
+            report = await run_load_test(4, port=port, max_moves=2)
+
+        self.assertEqual((report["errors"], report["moves"]), (0, 8))
+        self.assertGreater(report["server"]["requests"], 4 * 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import os
+import tempfile
+import unittest
+
+from ai import AI
+from hex import HexMap, piece_names, piece_codes
+from tablebase import Tablebase, TablebaseSet, parse_material, submaterials, generate_file, DRAW, WIN, LOSS, ILLEGAL
+
+
+class TablebaseTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # A radius 2 board keeps generation quick.
+        cls.table = Tablebase.generate("KQvK", radius=2)
+        cls.tables = TablebaseSet([cls.table])
+
+    def position(self, index: int) -> HexMap:
+        """The position of a tablebase index, as a board."""
+        hex_map = HexMap.from_radius(2)
+        for place, code in zip(self.table.places, self.table.codes):
+            hex_map[index // place % self.table.cells] = piece_names[code]
+        hex_map.ply = int(index >= self.table.half)
+        self.assertEqual(hex_map.compute_key(), hex_map.key)
+        return hex_map
+
+    def test_consistent(self):
+        # Every position's result follows from the results of its moves.
+        for index in range(len(self.table)):
+            result, distance = self.table.result(index)
+            if result == ILLEGAL:
+                continue
+
+            hex_map = self.position(index)
+            color = "b" if hex_map.ply % 2 else "w"
+            replies = []
+            for move in hex_map.legal_moves(color):
+                hex_map.push(move)
+                replies.append(self.tables.probe(hex_map))
+                hex_map.pop()
+
+            if not replies:
+                self.assertEqual((result, distance), (LOSS, 0) if hex_map.is_king_checked(color) else (DRAW, 0))
+            elif any(reply == LOSS for reply, _ in replies):
+                self.assertEqual((result, distance), (WIN, 1 + min(d for reply, d in replies if reply == LOSS)))
+            elif all(reply == WIN for reply, _ in replies):
+                self.assertEqual((result, distance), (LOSS, 1 + max(d for _, d in replies)))
+            else:
+                self.assertEqual((result, distance), (DRAW, 0))
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as directory:
+            self.table.save(os.path.join(directory, "KQvK.tb"))
+            tables = TablebaseSet.load_directory(directory)
+            loaded = tables.tables["KQvK"]
+            self.assertEqual(bytes(loaded.results), bytes(self.table.results))
+            self.assertEqual(bytes(loaded.distances), bytes(self.table.distances))
+            loaded.close()
+
+    def test_generate_file(self):
+        self.assertEqual(submaterials("KQvKR"), ["KvKR", "KQvK"])
+
+        # The smaller tablebases a capture leads to are saved along with the one asked for.
+        with tempfile.TemporaryDirectory() as directory:
+            generate_file("KQvKR", 1, directory)
+            self.assertEqual(sorted(os.listdir(directory)), ["KQvK.tb", "KQvKR.tb", "KvKR.tb"])
+
+    def test_swapped_colours(self):
+        # Black having the queen is the same as White having it, with the board turned around.
+        for index in range(0, len(self.table), 97):
+            if self.table.result(index)[0] == ILLEGAL:
+                continue
+            hex_map = self.position(index)
+            swapped = HexMap.from_radius(2)
+            for cell, code in enumerate(hex_map.board):
+                if code:
+                    swapped[self.table.mirror[cell]] = piece_names[code ^ 8]
+            swapped.ply = 1 - hex_map.ply
+            self.assertEqual(self.tables.probe(swapped), self.table.result(index))
+
+    def test_ai_mates(self):
+        # From the longest win with White to move, the AI mates in exactly as many plies as the tablebase says.
+        index = max(range(self.table.half), key=lambda i: (self.table.result(i)[0] == WIN, self.table.result(i)[1]))
+        hex_map = self.position(index)
+        distance = self.table.result(index)[1]
+        AI.tablebases = self.tables
+        try:
+            for _ in range(distance):
+                AI.move(hex_map, max_depth=1)
+        finally:
+            AI.tablebases = None
+        self.assertFalse(hex_map.legal_moves("b"))
+        self.assertTrue(hex_map.is_king_checked("b"))
+
+    def test_pawns(self):
+        # Pawns aren't covered, so a position with one is left to the search rather than looked up.
+        hex_map = HexMap.from_radius(2)
+        for state, cell in [("w_king", 0), ("w_pawn", 7), ("b_king", 18)]:
+            hex_map[cell] = state
+        self.assertIsNone(self.tables.probe(hex_map))
+
+        AI.tablebases = self.tables
+        try:
+            start, end = AI.move(hex_map, max_depth=2)
+        finally:
+            AI.tablebases = None
+        self.assertIn(hex_map.board[hex_map.index_of(end)], (piece_codes["w_king"], piece_codes["w_pawn"]))
+
+    def test_material(self):
+        self.assertEqual(len(parse_material("KRvKN")), 4)
+        self.assertRaises(ValueError, parse_material, "KPvK")
+        self.assertRaises(ValueError, parse_material, "KQK")
+        self.assertRaises(ValueError, Tablebase.generate, "QvK", 2)
@@ -0,0 +1,93 @@
+import os
+import struct
+import tempfile
+import unittest
+
+import evaluation
+from transposition import TranspositionTable, EXACT, LOWER, UPPER, FORMAT_VERSION
+
+
+class TranspositionTableTest(unittest.TestCase):
+    def test_store_probe(self):
+        table = TranspositionTable(entries=64)
+        self.assertIsNone(table.probe(12345))
+
+        table.store(12345, 3, -40, LOWER, 7)
+        self.assertEqual(table.probe(12345), (3, -40, LOWER, 7))
+        self.assertEqual((table.hits, table.misses), (1, 1))
+
+        table.clear()
+        self.assertIsNone(table.probe(12345))
+
+    def test_replacement(self):
+        table = TranspositionTable(entries=2)
+        self.assertEqual(len(table), 2)
+
+        # Every key shares the one bucket. The deep search keeps its slot, while shallower ones replace each other.
+        table.store(1, 5, 10, EXACT)
+        table.store(2, 1, 20, UPPER)
+        table.store(3, 2, 30, EXACT)
+
+        self.assertEqual(table.probe(1), (5, 10, EXACT, 0))
+        self.assertIsNone(table.probe(2))
+        self.assertEqual(table.probe(3), (2, 30, EXACT, 0))
+        self.assertEqual(table.collisions, 1)
+
+        # A search at least as deep takes over the depth-preferred slot.
+        table.store(4, 5, 40, EXACT)
+        self.assertIsNone(table.probe(1))
+        self.assertEqual(table.probe(4), (5, 40, EXACT, 0))
+
+    def test_capacity(self):
+        table = TranspositionTable(megabytes=1)
+        self.assertEqual(len(table), 1024 * 1024 // TranspositionTable.ENTRY_SIZE // 2 * 2)
+
+    def test_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "cache.bin")
+            table = TranspositionTable(entries=64, path=path)
+            table.store(12345, 3, -40, LOWER, 7)
+
+            # Another process mapping the file sees the entry straight away, and it is still there next session.
+            other = TranspositionTable(entries=1024, path=path)
+            self.assertEqual(len(other), 64)
+            self.assertEqual(other.probe(12345), (3, -40, LOWER, 7))
+            other.close()
+            table.close()
+
+            table = TranspositionTable(path=path)
+            self.assertEqual(table.probe(12345), (3, -40, LOWER, 7))
+
+            # An entry half overwritten by another process no longer matches its key.
+            table.scores[12345 % table.buckets * 2] = 99
+            self.assertIsNone(table.probe(12345))
+            table.close()
+
+            # A file from another format or evaluation, or that isn't a table at all, is never overwritten, as other
+            # processes may have it mapped. The table is kept in memory instead.
+            with open(path, "r+b") as file:
+                file.seek(8)
+                file.write(struct.pack("<I", FORMAT_VERSION - 1))
+            self.assertFalse(TranspositionTable.matches(path, evaluation.fingerprint()))
+            with open(path, "rb") as file:
+                stale = file.read()
+            for contents in (stale, b"something else"):
+                with open(path, "wb") as file:
+                    file.write(contents)
+                with self.assertWarns(UserWarning):
+                    table = TranspositionTable(entries=64, path=path)
+                self.assertEqual((table.path, len(table), table.probe(12345)), (None, 64, None))
+                table.store(12345, 3, -40, LOWER, 7)
+                table.close()
+                with open(path, "rb") as file:
+                    self.assertEqual(file.read(), contents)
+
+            # A new file is made whole, with nothing left behind.
+            os.remove(path)
+            table = TranspositionTable(entries=64, path=path)
+            self.assertTrue(TranspositionTable.matches(path, evaluation.fingerprint()))
+            self.assertEqual(os.listdir(directory), ["cache.bin"])
+            table.close()
+
+if __name__ == '__main__':
+    unittest.main()
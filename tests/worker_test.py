@@ -0,0 +1,82 @@
+import time
+import unittest
+
+from ai import AI
+from hex import HexCoord, HexMap
+from worker import SearchWorker
+
+
+class SearchWorkerTest(unittest.TestCase):
+    def wait_for_move(self, worker, hex_map):
+        for _ in range(1000):
+            move = worker.poll(hex_map)
+            if move is not None:
+                return move
+            time.sleep(0.01)
+        self.fail("the worker never finished its search")
+
+    def test_search(self):
+        hex_map = HexMap.from_glinski()
+        hex_map.push(hex_map.parse_move("f5f6"))
+        key = hex_map.key
+
+        worker = SearchWorker(max_depth=2)
+        worker.start(hex_map)
+        move = self.wait_for_move(worker, hex_map)
+
+        # The search runs on a copy, so the game's board is left for the caller to move on.
+        self.assertEqual(hex_map.key, key)
+        self.assertIn(move, list(hex_map.moves_for_col("b")))
+        self.assertIsNone(worker.poll(hex_map))
+
+    def test_moved_on(self):
+        hex_map = HexMap.from_glinski()
+        hex_map.push(hex_map.parse_move("f5f6"))
+
+        worker = SearchWorker(max_depth=2)
+        worker.start(hex_map)
+        worker.thread.join()
+
+        # Once the board has moved on, the move searched for the old position is never handed back.
+        hex_map.push(hex_map.parse_move("e7e6"))
+        self.assertIsNone(worker.poll(hex_map))
+        self.assertFalse(worker.thinking)
+
+    def test_ponder_hit(self):
+        hex_map = HexMap.from_glinski()
+        hex_map.push(hex_map.parse_move("f5f6"))
+
+        worker = SearchWorker(time_limit=5, max_depth=3)
+        worker.start(hex_map)
+        hex_map.make_move(*self.wait_for_move(worker, hex_map))
+
+        # Black ponders on White's expected reply, and shows no move until White actually plays it.
+        reply = AI.predicted_move(hex_map)
+        self.assertIsNotNone(reply)
+        worker.ponder(hex_map)
+        self.assertTrue(worker.pondering)
+        self.assertIsNone(worker.poll(hex_map))
+
+        ponder_thread = worker.thread
+        hex_map.push(reply)
+        worker.start(hex_map)
+        self.assertIs(worker.thread, ponder_thread)
+        self.assertIn(self.wait_for_move(worker, hex_map), list(hex_map.moves_for_col("b")))
+
+    def test_cancel(self):
+        hex_map = HexMap.from_glinski()
+        hex_map.push((HexCoord(0, -1, 1), HexCoord(0, 0, 0)))
+
+        worker = SearchWorker(max_depth=20)
+        worker.start(hex_map)
+        time.sleep(0.2)
+
+        start_time = time.perf_counter()
+        worker.cancel()
+        self.assertLess(time.perf_counter() - start_time, 1)
+        self.assertIsNone(worker.thread)
+        self.assertIsNone(worker.poll(hex_map))
+
+
+if __name__ == '__main__':
+    unittest.main()